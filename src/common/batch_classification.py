@@ -0,0 +1,243 @@
+import argparse
+import csv
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import pandas as pd
+from src.common import classification
+from src.common.classification import LookupSource, OperatorProfile
+from src.common.natureza import NATUREZA_INVALIDA
+
+""" CLASSIFICAÇÃO EM LOTE: VÁRIOS ARQUIVOS, UMA ÚNICA CONSULTA DOS CNPJs E OS ARQUIVOS EM PARALELO """
+
+# Linhas por bloco, tanto na coleta dos CNPJs quanto na classificação em streaming
+BATCH_CHUNKSIZE = 500_000
+
+# Sufixo do arquivo de saída quando não informado (mesmo padrão dos scripts das operadoras)
+OUTPUT_SUFFIX = '_Classificado'
+
+
+class Job(NamedTuple):
+    """Um arquivo a classificar: entrada, saída e perfil da operadora."""
+    input_csv: str
+    output_csv: str
+    profile: OperatorProfile
+
+
+def available_profiles():
+    """
+    Perfis das operadoras por nome, como aceitos em --profile e na coluna 'profile' do manifesto.
+
+    Returns:
+    - dict: {nome: OperatorProfile}.
+    """
+    # Importados aqui para que o motor não dependa dos pacotes de cada operadora
+    from src.compare_tim.config import PROFILE_TIM
+    from src.compare_vivo_VGI.config import PROFILE_VIVO_VGI, PROFILE_VIVO_VGI_KEYWORDS
+
+    return {
+        'TIM': PROFILE_TIM,
+        'VIVO_VGI': PROFILE_VIVO_VGI,
+        'VIVO_VGI_KEYWORDS': PROFILE_VIVO_VGI_KEYWORDS,
+    }
+
+
+def output_path(input_csv):
+    """
+    Caminho de saída padrão: o mesmo arquivo com o sufixo OUTPUT_SUFFIX.
+
+    Ex.: 'data/tim/TIM_ativos_12_25.csv' -> 'data/tim/TIM_ativos_12_25_Classificado.csv'
+    """
+    base, ext = os.path.splitext(input_csv)
+    return f"{base}{OUTPUT_SUFFIX}{ext or '.csv'}"
+
+
+def jobs_from_glob(pattern, profile):
+    """
+    Um job por arquivo que casa com o padrão, ignorando saídas de execuções anteriores.
+
+    Args:
+    - pattern (str): Padrão glob dos arquivos de entrada (ex.: 'data/tim/*.csv').
+    - profile (OperatorProfile): Perfil usado em todos os arquivos.
+
+    Returns:
+    - list: Lista de Job, em ordem alfabética dos arquivos.
+    """
+    arquivos = sorted(glob.glob(pattern))
+    return [
+        Job(arquivo, output_path(arquivo), profile)
+        for arquivo in arquivos
+        if not os.path.splitext(arquivo)[0].endswith(OUTPUT_SUFFIX)
+    ]
+
+
+def jobs_from_manifest(path, profiles=None):
+    """
+    Lê um manifesto CSV com as colunas profile, input_csv e output_csv (opcional).
+
+    Args:
+    - path (str): Caminho do manifesto.
+    - profiles (dict, opcional): Perfis por nome; se None, usa available_profiles().
+
+    Returns:
+    - list: Lista de Job, na ordem do manifesto.
+    """
+    profiles = profiles if profiles is not None else available_profiles()
+
+    jobs = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            nome = linha['profile'].strip()
+            if nome not in profiles:
+                raise ValueError(f"Perfil desconhecido no manifesto: {nome} (disponíveis: {sorted(profiles)})")
+            entrada = linha['input_csv'].strip()
+            saida = (linha.get('output_csv') or '').strip() or output_path(entrada)
+            jobs.append(Job(entrada, saida, profiles[nome]))
+    return jobs
+
+
+def distinct_cnpjs(job, chunksize=BATCH_CHUNKSIZE):
+    """
+    CNPJs distintos do arquivo, já normalizados como o motor normaliza (strip + 14 dígitos).
+    Lê apenas a coluna de CNPJ do perfil, em blocos e com o dtype que a leitura do arquivo inteiro
+    teria (uma coluna com algum texto é lida toda como texto, preservando os zeros à esquerda).
+
+    Args:
+    - job (Job): Arquivo e perfil.
+    - chunksize (int): Quantidade de linhas por bloco.
+
+    Returns:
+    - set: CNPJs distintos.
+    """
+    coluna = job.profile.cnpj_column
+    dtypes = classification._inferir_dtypes(job.input_csv, chunksize, usecols=[coluna])
+    cnpjs = set()
+    for chunk in pd.read_csv(job.input_csv, usecols=[coluna], chunksize=chunksize, dtype=dtypes):
+        valores = pd.Series(chunk[coluna].dropna().unique(), dtype=object)
+        cnpjs.update(valores.astype(str).str.strip().str.zfill(14))
+    return cnpjs
+
+
+def resolve_details(jobs, chunksize=BATCH_CHUNKSIZE):
+    """
+    Consulta de uma só vez a união dos CNPJs de todos os arquivos (uma consulta por origem distinta;
+    TIM e Vivo compartilham a mesma origem).
+
+    Args:
+    - jobs (list): Lista de Job.
+    - chunksize (int): Quantidade de linhas por bloco na leitura dos CNPJs.
+
+    Returns:
+    - dict: {LookupSource: {cnpj: detalhes}}, com todos os campos dos detalhes (usados pelas regras).
+      Todo CNPJ consultado aparece no dicionário; os não encontrados ficam com natureza None.
+    """
+    cnpjs_por_fonte: Dict[LookupSource, set] = {}
+    for job in jobs:
+        cnpjs_por_fonte.setdefault(job.profile.source, set()).update(distinct_cnpjs(job, chunksize))
+
+    resolvidos = {}
+    for source, cnpjs in cnpjs_por_fonte.items():
+        cnpjs = sorted(cnpjs)
+        details = classification.lookup_company_details(cnpjs, source) if cnpjs else {}
+        nao_encontrado = {'natureza_juridica': None, 'natureza_codigo': NATUREZA_INVALIDA}
+        resolvidos[source] = {cnpj: details.get(cnpj, nao_encontrado) for cnpj in cnpjs}
+        logging.info(f"Lote: {len(cnpjs)} CNPJs distintos resolvidos em uma consulta ({len(details)} encontrados)")
+    return resolvidos
+
+
+# Detalhes resolvidos pelo processo principal, entregues a cada processo do pool pelo inicializador
+_detalhes_por_fonte: Dict[LookupSource, dict] = {}
+
+
+def _init_worker(detalhes):
+    global _detalhes_por_fonte
+    _detalhes_por_fonte = detalhes
+
+
+def _lookup_compartilhado(source, cnpjs):
+    """
+    Detalhes a partir dos já resolvidos em lote. CNPJs que ficaram de fora da coleta (ex.: a coluna
+    lida com outro tipo) ainda são consultados na origem, então o resultado não depende da coleta.
+    """
+    resolvidos = _detalhes_por_fonte.get(source, {})
+    details = {}
+    faltando = []
+    for cnpj in cnpjs:
+        if cnpj in resolvidos:
+            details[cnpj] = resolvidos[cnpj]
+        else:
+            faltando.append(cnpj)
+
+    if faltando:
+        logging.warning(f"{len(faltando)} CNPJs fora da consulta em lote; consultando na origem.")
+        details.update(classification.lookup_company_details(faltando, source))
+    return details
+
+
+def _classificar(job, chunksize):
+    """Classifica um arquivo (executado em um processo do pool)."""
+    def lookup(cnpjs):
+        return _lookup_compartilhado(job.profile.source, cnpjs)
+
+    return classification.process_csv(job.input_csv, job.output_csv, job.profile, chunksize=chunksize,
+                                      lookup=lookup)
+
+
+def run_batch(jobs: List[Job], workers: Optional[int] = None, chunksize: int = BATCH_CHUNKSIZE):
+    """
+    Classifica vários arquivos: coleta os CNPJs de todos, resolve a união em uma consulta e grava
+    cada arquivo em um processo do pool. Cada saída é idêntica à do process_csv do arquivo sozinho.
+
+    Args:
+    - jobs (list): Lista de Job.
+    - workers (int, opcional): Processos em paralelo (padrão: quantidade de CPUs, limitada ao número de arquivos).
+    - chunksize (int): Quantidade de linhas por bloco.
+
+    Returns:
+    - dict: {arquivo de saída: quantidade de linhas gravadas}.
+    """
+    if not jobs:
+        logging.error("Nenhum arquivo para classificar.")
+        return {}
+
+    # regras com campos indisponíveis falham aqui, antes da consulta e dos processos do pool
+    for job in jobs:
+        classification._rule_set(job.profile)
+
+    detalhes = resolve_details(jobs, chunksize)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if workers == 1:
+        _init_worker(detalhes)
+        return {job.output_csv: _classificar(job, chunksize) for job in jobs}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(detalhes,)) as executor:
+        futuros = {job.output_csv: executor.submit(_classificar, job, chunksize) for job in jobs}
+        return {saida: futuro.result() for saida, futuro in futuros.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifica vários arquivos com uma única consulta dos CNPJs.")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--glob", help="Padrão dos arquivos de entrada (exige --profile).")
+    origem.add_argument("--manifest", help="CSV com as colunas profile, input_csv e output_csv (opcional).")
+    parser.add_argument("--profile", help="Perfil da operadora para os arquivos do --glob (ex.: TIM, VIVO_VGI).")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo.")
+    parser.add_argument("--chunksize", type=int, default=BATCH_CHUNKSIZE, help="Linhas por bloco.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.glob:
+        perfis = available_profiles()
+        if args.profile not in perfis:
+            parser.error(f"--profile deve ser um de {sorted(perfis)}")
+        lote = jobs_from_glob(args.glob, perfis[args.profile])
+    else:
+        lote = jobs_from_manifest(args.manifest)
+
+    for saida, linhas in run_batch(lote, workers=args.workers, chunksize=args.chunksize).items():
+        print(f"{saida}: {linhas} linhas")
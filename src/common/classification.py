@@ -0,0 +1,375 @@
+import logging
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from src.common.cnpj_cache import open_cache
+from src.common.company_snapshot import CompanySnapshot
+from src.common.database_utils import run_batched_query, stream_array_query
+from src.common.natureza import NATUREZA_INVALIDA, details_natureza_code, natureza_code
+from src.common.rules import CAMPO_RAZAO_SOCIAL, Rule, RuleSet
+
+""" MOTOR ÚNICO DE CLASSIFICAÇÃO GOVERNO/PRIVADO, CONFIGURADO POR UM PERFIL POR OPERADORA """
+
+# Consulta do modo 'batch' (lotes 'IN' em paralelo)
+SQL_QUERY_IN_NATUREZA_JURIDICA = """
+    SELECT cnpj_completo, natureza_juridica
+    FROM company_details
+    WHERE cnpj_completo IN %s;
+    """
+
+# Modos de consulta aceitos em LookupSource.mode
+LOOKUP_MODES = ('bulk', 'batch')
+
+# Campos dos detalhes da empresa que a consulta, o cache e o snapshot fornecem (por CNPJ)
+DETAIL_FIELDS = ('natureza_juridica', 'natureza_codigo')
+
+
+class LookupSource(NamedTuple):
+    """De onde vêm os detalhes das empresas.
+
+    query: consulta do modo 'bulk' (ANY(array)), que retorna (cnpj_completo, natureza_juridica).
+    mode: 'bulk' (uma única ida ao banco) ou 'batch' (lotes 'IN' em paralelo).
+    cache_path/cache_ttl_days: cache local de CNPJ (None desativa).
+    snapshot_path: snapshot local de company_details; quando definido, substitui o banco.
+    fields: campos dos detalhes fornecidos pela origem (os únicos que as regras podem usar).
+    """
+    query: str
+    mode: str = 'bulk'
+    batch_size: int = 1000
+    max_workers: int = 4
+    itersize: int = 10000
+    cache_path: Optional[str] = None
+    cache_ttl_days: Optional[float] = None
+    snapshot_path: Optional[str] = None
+
+    @property
+    def fields(self):
+        return DETAIL_FIELDS
+
+
+class OperatorProfile(NamedTuple):
+    """Definição declarativa de uma operadora.
+
+    cnpj_column: coluna do arquivo com o CNPJ do cliente (ex.: 'CNPJ' na TIM, 'NR_DOCUMENTO' na Vivo).
+    gov_naturezas/gov_exceptions_cnpjs: regras de natureza jurídica e de CNPJs tratados como governo.
+    name_column/keywords_gov: regra de palavras-chave na razão social; só roda se ambas estiverem
+    definidas (a palavra encontrada vai para a coluna 'palavra_chave_gov').
+    extra_rules: regras adicionais, avaliadas depois das anteriores, sobre 'cnpj', 'razao_social'
+    (exige name_column) ou um campo fornecido pela origem (source.fields); um campo que a origem
+    não fornece (ex.: CNAE, capital_social) levanta ValueError em vez de nunca casar.
+    """
+    name: str
+    cnpj_column: str
+    source: LookupSource
+    gov_naturezas: FrozenSet[int]
+    gov_exceptions_cnpjs: FrozenSet[str]
+    name_column: Optional[str] = None
+    keywords_gov: Tuple[str, ...] = ()
+    extra_rules: Tuple[Rule, ...] = ()
+
+    @property
+    def uses_keywords(self):
+        return bool(self.name_column and self.keywords_gov)
+
+    def rules(self):
+        """Regras do perfil, na ordem de prioridade do motivo."""
+        regras = [
+            Rule('natureza_juridica', 'natureza_codigo', 'in', frozenset(self.gov_naturezas)),
+            Rule('cnpj_excecao', 'cnpj', 'in', frozenset(self.gov_exceptions_cnpjs)),
+        ]
+        if self.uses_keywords:
+            regras.append(Rule('palavra_chave_gov', CAMPO_RAZAO_SOCIAL, 'keyword', tuple(self.keywords_gov)))
+        return tuple(regras) + tuple(self.extra_rules)
+
+
+# Coluna de saída com as regras que classificaram a linha como GOVERNO
+COLUNA_MOTIVO = 'motivo_classificacao'
+
+# Um conjunto de regras compilado por perfil, reaproveitado entre chamadas (e entre blocos do streaming)
+_rule_sets = {}
+
+
+def _validar_campos(profile, regras):
+    """Levanta ValueError se alguma regra usa um campo que nem o arquivo nem a origem fornecem."""
+    disponiveis = {'cnpj', *profile.source.fields}
+    if profile.name_column:
+        disponiveis.add(CAMPO_RAZAO_SOCIAL)
+    for regra in regras:
+        if regra.field not in disponiveis:
+            raise ValueError(
+                f"Regra {regra.name!r} do perfil {profile.name} usa o campo {regra.field!r}, que não está "
+                f"disponível (campos: {sorted(disponiveis)})."
+            )
+
+
+def _rule_set(profile):
+    regras = profile.rules()
+    _validar_campos(profile, regras)
+    if regras not in _rule_sets:
+        _rule_sets[regras] = RuleSet(regras)
+    return _rule_sets[regras]
+
+
+def fetch_company_details(cnpjs, source, use_cache=True, db_pool=None):
+    """
+    Busca detalhes da empresa no banco de dados para uma lista de CNPJs.
+
+    No modo 'bulk' todos os CNPJs vão em uma única consulta (ANY(array)) e o resultado é lido em
+    streaming por um cursor do lado do servidor; no modo 'batch' são consultados em lotes paralelos.
+
+    Os CNPJs já presentes no cache local (e dentro do TTL) não são consultados no banco;
+    o resultado da consulta, inclusive os CNPJs não encontrados, é gravado de volta no cache.
+
+    Args:
+    - cnpjs (list): Lista de CNPJs para buscar os detalhes.
+    - source (LookupSource): Consulta, modo, lotes e cache a usar.
+    - use_cache (bool): Se False, ignora o cache local e consulta todos os CNPJs no banco.
+    - db_pool: Pool de conexões a reutilizar no modo 'batch'; se None, um pool é criado para a chamada.
+
+    Returns:
+    - dict: Dicionário com detalhes da empresa, indexado pelo CNPJ.
+    """
+    if source.mode not in LOOKUP_MODES:
+        raise ValueError(f"Modo de consulta desconhecido: {source.mode!r} (use um de {LOOKUP_MODES})")
+
+    cnpjs = [cnpj.strip().zfill(14) for cnpj in cnpjs if cnpj and cnpj.strip()]
+
+    if not cnpjs:
+        logging.error("A lista de CNPJs está vazia após a limpeza.")
+        return {}
+
+    company_details = {}
+
+    cache = open_cache(source.cache_path, source.cache_ttl_days) if use_cache else None
+    if cache is not None:
+        company_details, cnpjs = cache.get_many(cnpjs)
+        logging.info(f"Cache de CNPJ: {cache.hits} hits, {cache.misses} misses ({cache.stale} expirados)")
+        if not cnpjs:
+            cache.close()
+            return company_details
+
+    fetched = {}
+
+    try:
+        if source.mode == 'bulk':
+            rows = stream_array_query(source.query, cnpjs, itersize=source.itersize)
+        else:  # 'batch'
+            rows = run_batched_query(SQL_QUERY_IN_NATUREZA_JURIDICA, cnpjs, batch_size=source.batch_size,
+                                     max_workers=source.max_workers, db_pool=db_pool)
+
+        # Mapeia os resultados para um dicionário (a natureza também como código inteiro, calculado uma vez aqui)
+        for row in rows:
+            fetched[row[0]] = {
+                'natureza_juridica': row[1],
+                'natureza_codigo': natureza_code(row[1]),
+            }
+
+    except Exception as e:
+        logging.error(f"Error fetching company details: {e}")
+        if cache is not None:
+            cache.close()
+        return company_details
+
+    # Só grava no cache depois de uma consulta completa, para não registrar falsos "não encontrados"
+    if cache is not None:
+        cache.put_many(fetched, cnpjs)
+        cache.close()
+
+    company_details.update(fetched)
+    return company_details
+
+
+def lookup_company_details(cnpjs, source):
+    """
+    Resolve os detalhes das empresas na origem configurada: snapshot local, se houver, senão o banco.
+
+    Args:
+    - cnpjs (list): Lista de CNPJs para buscar os detalhes.
+    - source (LookupSource): Origem dos detalhes.
+
+    Returns:
+    - dict: Dicionário com detalhes da empresa, indexado pelo CNPJ.
+    """
+    if source.snapshot_path:
+        return CompanySnapshot(source.snapshot_path).get_details(cnpjs)
+    return fetch_company_details(cnpjs, source)
+
+
+def _expandir(valores, codigos, padrao):
+    """
+    Propaga para as linhas os valores calculados por valor distinto, usando os códigos de pd.factorize.
+
+    Args:
+    - valores (array-like): Um valor por item distinto, na ordem da fatoração.
+    - codigos (np.ndarray): Códigos retornados pelo pd.factorize (-1 = valor nulo).
+    - padrao: Valor usado nas linhas com código -1.
+
+    Returns:
+    - np.ndarray: Um valor por linha.
+    """
+    return np.append(np.asarray(valores), padrao)[codigos]
+
+
+def add_company_details(df, profile, snapshot=None, lookup=None):
+    """
+    Adiciona detalhes da empresa ao DataFrame com base nos CNPJs e classifica as empresas.
+
+    Args:
+    - df (pd.DataFrame): O DataFrame contendo os dados a serem atualizados.
+    - profile (OperatorProfile): Colunas e regras da operadora.
+    - snapshot (CompanySnapshot, opcional): Snapshot local de company_details; se informado, os
+      detalhes são resolvidos nele em vez de consultar o banco.
+    - lookup (callable, opcional): Função (lista de CNPJs) -> dict, com o mesmo contrato de
+      fetch_company_details, usada no lugar do snapshot e do banco (ex.: detalhes já resolvidos em lote).
+
+    Returns:
+    - pd.DataFrame: O DataFrame atualizado com detalhes da empresa adicionados e classificações.
+    """
+    coluna_cnpj = profile.cnpj_column
+    regras = _rule_set(profile)
+
+    # Fatora a coluna de CNPJ: cada valor distinto é normalizado, consultado e classificado uma única
+    # vez, e o resultado é propagado para as linhas pelos códigos inteiros (-1 = CNPJ nulo)
+    codigos, cnpjs = pd.factorize(df[coluna_cnpj])
+
+    # Limpa e ajusta os CNPJs distintos (CUST_ID_TEXT)
+    cnpjs = pd.Series(cnpjs, dtype=object).astype(str).str.strip().str.zfill(14)
+
+    usa_nome = CAMPO_RAZAO_SOCIAL in regras.fields
+    if usa_nome:
+        # Mesma ideia para a razão social: normaliza e avalia as regras uma vez por nome distinto
+        codigos_nome, nomes = pd.factorize(df[profile.name_column])
+        nomes = pd.Series(nomes, dtype=object).astype(str).str.strip().str.upper()
+        bits_por_nome, detalhes_nome = regras.evaluate({CAMPO_RAZAO_SOCIAL: nomes})
+
+    # Busca detalhes das empresas (os CNPJs nulos ficaram de fora da fatoração)
+    if lookup is not None:
+        company_details = lookup(cnpjs.unique().tolist())
+    elif snapshot is not None:
+        company_details = snapshot.get_details(cnpjs.unique().tolist())
+    else:
+        company_details = fetch_company_details(cnpjs.unique().tolist(), profile.source)
+
+    # Tabela de consulta com uma linha por CNPJ encontrado no banco; a natureza vem também como
+    # código inteiro (calculado na consulta, no cache ou no snapshot), usado pelas regras
+    naturezas = pd.Series(
+        {cnpj: details.get('natureza_juridica') for cnpj, details in company_details.items()},
+        dtype=object
+    )
+    codigos_natureza = np.fromiter(
+        (details_natureza_code(details) for details in company_details.values()),
+        dtype=np.int16, count=len(company_details)
+    )
+
+    # Junção vetorizada: posição de cada CNPJ distinto na tabela de consulta. CNPJs não encontrados
+    # recebem -1 e caem na última posição, que guarda o valor padrão (None / código inválido)
+    posicao = naturezas.index.get_indexer(cnpjs)
+    natureza_por_cnpj = np.append(naturezas.to_numpy(), None)[posicao]
+
+    # Fatos de cada CNPJ distinto avaliados pelas regras: o próprio CNPJ e os campos dos detalhes
+    fatos = {
+        'cnpj': cnpjs,
+        'natureza_juridica': pd.Series(natureza_por_cnpj, dtype=object),
+        'natureza_codigo': pd.Series(np.append(codigos_natureza, np.int16(NATUREZA_INVALIDA))[posicao]),
+    }
+    # Uma passada por todas as regras: um bit por regra que casou (0 = nenhuma, PRIVADO)
+    bits = _expandir(regras.evaluate(fatos)[0], codigos, np.uint32(0))
+
+    if usa_nome:
+        bits |= _expandir(bits_por_nome, codigos_nome, np.uint32(0))
+
+    # Atualiza o DataFrame com os detalhes da empresa
+    df[coluna_cnpj] = _expandir(cnpjs, codigos, '')
+    df['natureza_juridica'] = _expandir(natureza_por_cnpj, codigos, None)
+
+    # Tipo derivado do bitset: 'GOVERNO' se alguma regra casou, 'PRIVADO' caso contrário
+    df['tipo_empresa'] = regras.tipo(bits)
+
+    if profile.uses_keywords:
+        # A palavra-chave encontrada na razão social (grupo 5S, palavra inteira) fica para auditoria
+        df[profile.name_column] = _expandir(nomes, codigos_nome, '')
+        df['palavra_chave_gov'] = _expandir(detalhes_nome['palavra_chave_gov'], codigos_nome, np.nan)
+
+    # Regras que casaram em cada linha, separadas por '|'
+    df[COLUNA_MOTIVO] = regras.motivo(bits)
+
+    return df
+
+
+def _inferir_dtypes(input_csv, chunksize, usecols=None):
+    """
+    Percorre o CSV em blocos apenas para descobrir o dtype final de cada coluna.
+
+    Ao ler o arquivo inteiro, o pandas unifica os tipos de todas as linhas (ex.: uma coluna
+    inteira com algum valor vazio vira float). Lendo em blocos essa unificação não acontece,
+    então ela é refeita aqui para que a saída em streaming seja idêntica à leitura completa.
+
+    Args:
+    - input_csv (str): Caminho para o arquivo CSV de entrada.
+    - chunksize (int): Quantidade de linhas por bloco.
+    - usecols (list, opcional): Colunas a considerar (padrão: todas).
+
+    Returns:
+    - dict: Dicionário {coluna: dtype} para ser usado no pd.read_csv.
+    """
+    tipos = {}
+    for chunk in pd.read_csv(input_csv, chunksize=chunksize, usecols=usecols):
+        for col, dtype in chunk.dtypes.items():
+            tipos.setdefault(col, set()).add(dtype)
+
+    dtypes = {}
+    for col, encontrados in tipos.items():
+        if len(encontrados) == 1:
+            dtypes[col] = encontrados.pop()
+        elif all(dtype.kind in 'iuf' for dtype in encontrados):
+            dtypes[col] = 'float64'
+        else:
+            dtypes[col] = object
+
+    return dtypes
+
+
+def process_csv(input_csv, output_csv, profile, chunksize=None, lookup=None):
+    """
+    Processa o arquivo CSV de entrada, classifica as empresas e salva o resultado em um novo arquivo CSV.
+
+    Com 'chunksize' definido o arquivo é lido, classificado e gravado em blocos, mantendo o uso
+    de memória constante independente do tamanho da entrada. A saída é idêntica à do modo completo.
+
+    Args:
+    - input_csv (str): Caminho para o arquivo CSV de entrada.
+    - output_csv (str): Caminho para salvar o arquivo CSV de saída.
+    - profile (OperatorProfile): Perfil da operadora do arquivo. Com profile.source.snapshot_path
+      definido, a classificação usa o snapshot de company_details em vez do banco.
+    - chunksize (int, opcional): Quantidade de linhas por bloco no modo streaming.
+    - lookup (callable, opcional): Resolve os detalhes no lugar do snapshot e do banco (ver add_company_details).
+
+    Returns:
+    - int: Quantidade de linhas gravadas.
+    """
+    snapshot_path = profile.source.snapshot_path
+    snapshot = CompanySnapshot(snapshot_path) if snapshot_path and lookup is None else None
+
+    if chunksize is None:
+        # Lê o arquivo CSV
+        df = pd.read_csv(input_csv)
+
+        # Adiciona os detalhes e classificações
+        df = add_company_details(df, profile, snapshot=snapshot, lookup=lookup)
+
+        # Salva o DataFrame resultante em um novo CSV
+        df.to_csv(output_csv, index=False)
+        print(f"Arquivo salvo com sucesso em: {output_csv}")
+        return len(df)
+
+    # Modo streaming: mesmos dtypes da leitura completa, classificação e escrita bloco a bloco
+    dtypes = _inferir_dtypes(input_csv, chunksize)
+    total_linhas = 0
+    for i, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunksize, dtype=dtypes)):
+        chunk = add_company_details(chunk, profile, snapshot=snapshot, lookup=lookup)
+        chunk.to_csv(output_csv, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        total_linhas += len(chunk)
+
+    print(f"Arquivo salvo com sucesso em: {output_csv} ({total_linhas} linhas)")
+    return total_linhas
@@ -0,0 +1,204 @@
+import logging
+import os
+import sqlite3
+import time
+
+from src.common.natureza import details_natureza_code, natureza_code
+
+""" CACHE LOCAL E PERSISTENTE DE CNPJ -> NATUREZA JURIDICA, COMPARTILHADO ENTRE TIM E VIVO """
+
+# A natureza fica gravada também como código inteiro (natureza_codigo, ver src/common/natureza.py),
+# calculado uma vez na gravação
+
+# Limite de parâmetros por consulta (o SQLite antigo aceita no máximo 999 variáveis)
+_SQLITE_BATCH = 900
+
+
+class CnpjCache:
+    """
+    Cache em disco (SQLite) dos detalhes de empresa consultados no Postgres, indexado pelo CNPJ de 14 dígitos.
+
+    Também guarda os CNPJs consultados e não encontrados no banco, para que eles não sejam
+    consultados de novo a cada execução. Entradas mais antigas que o TTL são tratadas como
+    ausentes e voltam a ser buscadas no banco.
+
+    Args:
+    - path (str): Caminho do arquivo SQLite do cache.
+    - ttl_days (float, opcional): Validade das entradas em dias. None = nunca expiram.
+    """
+
+    def __init__(self, path, ttl_days=None):
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS company_details_cache (
+                cnpj TEXT PRIMARY KEY,
+                encontrado INTEGER NOT NULL,
+                natureza_juridica TEXT,
+                atualizado_em REAL NOT NULL,
+                natureza_codigo INTEGER
+            )
+        """)
+        self._migrar_natureza_codigo()
+        self._conn.commit()
+
+    def _migrar_natureza_codigo(self):
+        """Caches criados antes do código da natureza ganham a coluna, preenchida a partir do texto."""
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(company_details_cache)")}
+        if 'natureza_codigo' in colunas:
+            return
+        self._conn.execute("ALTER TABLE company_details_cache ADD COLUMN natureza_codigo INTEGER")
+        self._conn.create_function('natureza_code', 1, natureza_code, deterministic=True)
+        self._conn.execute("UPDATE company_details_cache SET natureza_codigo = natureza_code(natureza_juridica)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def _expirado(self, atualizado_em, agora):
+        return self.ttl_seconds is not None and agora - atualizado_em > self.ttl_seconds
+
+    def get_many(self, cnpjs):
+        """
+        Busca uma lista de CNPJs no cache.
+
+        Args:
+        - cnpjs (list): Lista de CNPJs já normalizados com 14 dígitos.
+
+        Returns:
+        - tuple: (dict com os detalhes encontrados no cache, list de CNPJs que precisam ir ao banco).
+        """
+        agora = time.time()
+        company_details = {}
+        conhecidos = set()
+
+        for i in range(0, len(cnpjs), _SQLITE_BATCH):
+            batch = cnpjs[i:i + _SQLITE_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = self._conn.execute(
+                f"SELECT cnpj, encontrado, natureza_juridica, natureza_codigo, atualizado_em "
+                f"FROM company_details_cache WHERE cnpj IN ({placeholders})",
+                batch
+            ).fetchall()
+
+            for cnpj, encontrado, natureza_juridica, natureza_codigo, atualizado_em in rows:
+                if self._expirado(atualizado_em, agora):
+                    self.stale += 1
+                    continue
+                conhecidos.add(cnpj)
+                if encontrado:
+                    company_details[cnpj] = {'natureza_juridica': natureza_juridica, 'natureza_codigo': natureza_codigo}
+
+        pendentes = [cnpj for cnpj in cnpjs if cnpj not in conhecidos]
+        self.hits += len(cnpjs) - len(pendentes)
+        self.misses += len(pendentes)
+
+        return company_details, pendentes
+
+    def put_many(self, company_details, consultados):
+        """
+        Grava no cache o resultado de uma consulta ao banco.
+
+        Args:
+        - company_details (dict): Detalhes retornados pelo banco, indexados pelo CNPJ.
+        - consultados (list): Todos os CNPJs consultados; os ausentes em 'company_details' são
+          gravados como não encontrados.
+        """
+        agora = time.time()
+        registros = [
+            (cnpj, 1, company_details[cnpj].get('natureza_juridica'), details_natureza_code(company_details[cnpj]), agora)
+            if cnpj in company_details
+            else (cnpj, 0, None, None, agora)
+            for cnpj in consultados
+        ]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO company_details_cache "
+            "(cnpj, encontrado, natureza_juridica, natureza_codigo, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?)",
+            registros
+        )
+        self._conn.commit()
+
+    def invalidate(self, cnpjs=None):
+        """
+        Remove entradas do cache para forçar uma nova consulta ao banco.
+
+        Args:
+        - cnpjs (list, opcional): CNPJs a invalidar. Se None, esvazia o cache inteiro.
+
+        Returns:
+        - int: Quantidade de entradas removidas.
+        """
+        if cnpjs is None:
+            removidos = self._conn.execute("DELETE FROM company_details_cache").rowcount
+        else:
+            cnpjs = list(cnpjs)
+            removidos = 0
+            for i in range(0, len(cnpjs), _SQLITE_BATCH):
+                batch = cnpjs[i:i + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                removidos += self._conn.execute(
+                    f"DELETE FROM company_details_cache WHERE cnpj IN ({placeholders})", batch
+                ).rowcount
+        self._conn.commit()
+        return removidos
+
+    def purge_expired(self):
+        """
+        Remove do arquivo as entradas que já passaram do TTL.
+
+        Returns:
+        - int: Quantidade de entradas removidas.
+        """
+        if self.ttl_seconds is None:
+            return 0
+        removidos = self._conn.execute(
+            "DELETE FROM company_details_cache WHERE atualizado_em < ?",
+            (time.time() - self.ttl_seconds,)
+        ).rowcount
+        self._conn.commit()
+        return removidos
+
+    def stats(self):
+        """
+        Retorna os contadores da sessão atual e o tamanho do cache.
+
+        Returns:
+        - dict: {'hits', 'misses', 'stale', 'entries'}.
+        """
+        entries = self._conn.execute("SELECT COUNT(*) FROM company_details_cache").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale, 'entries': entries}
+
+
+def open_cache(path, ttl_days=None):
+    """
+    Abre o cache de CNPJs sem interromper o processamento caso o arquivo não possa ser usado.
+
+    Args:
+    - path (str): Caminho do arquivo SQLite. Se None, o cache fica desativado.
+    - ttl_days (float, opcional): Validade das entradas em dias.
+
+    Returns:
+    - CnpjCache | None: O cache aberto, ou None se desativado ou indisponível.
+    """
+    if not path:
+        return None
+    try:
+        return CnpjCache(path, ttl_days)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Cache de CNPJ indisponível, consultando apenas o banco: {e}")
+        return None
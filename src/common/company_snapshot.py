@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import os
+import numpy as np
+from src.common.natureza import natureza_code, natureza_codes
+
+""" SNAPSHOT LOCAL DA TABELA company_details PARA CLASSIFICAR SEM ACESSO AO BANCO """
+
+# Formato do diretório do snapshot:
+#   meta.json                      -> quantidade de linhas e largura da natureza jurídica
+#   cnpj.int64                     -> CNPJs como int64, em ordem crescente (chave da busca binária)
+#   natureza_juridica.bytes        -> natureza jurídica como vem do banco, em largura fixa, alinhada com cnpj.int64
+#   natureza_nula.bool             -> 1 onde a natureza jurídica é NULL no banco
+#   natureza_codigo.int16          -> natureza jurídica como código inteiro (-1 = fora do formato)
+#   empresa_razao_social.offsets   -> int64, início de cada razão social em .data (n + 1 posições)
+#   empresa_razao_social.data      -> bytes UTF-8 concatenados
+# Todos os arquivos são abertos com np.memmap, então carregar o snapshot não lê o arquivo inteiro.
+
+SQL_QUERY_EXPORT_COMPANY_DETAILS = """
+    SELECT cnpj_completo, natureza_juridica, empresa_razao_social
+    FROM company_details
+    ORDER BY cnpj_completo COLLATE "C"
+    """
+
+NATUREZA_WIDTH = 8
+
+# Peso de cada um dos 14 dígitos do CNPJ
+_PESOS_CNPJ = 10 ** np.arange(13, -1, -1, dtype=np.int64)
+
+
+def cnpjs_to_int64(cnpjs):
+    """
+    Converte CNPJs de 14 dígitos para int64 de forma vetorizada.
+
+    O texto é visto como uma matriz de caracteres (uma linha por CNPJ) e convertido com uma única
+    multiplicação matricial, sem laço em Python e sem int() por linha.
+
+    Args:
+    - cnpjs (array-like): CNPJs como texto de 14 dígitos ou como inteiros.
+
+    Returns:
+    - tuple: (np.ndarray int64 com os CNPJs, np.ndarray bool indicando quais eram válidos).
+      CNPJs inválidos recebem -1.
+    """
+    valores = np.asarray(cnpjs)
+    if valores.dtype.kind in 'iu':
+        valores = valores.astype(np.int64)
+        return valores, valores >= 0
+
+    # Uma posição a mais para detectar textos com mais de 14 caracteres
+    texto = np.asarray(valores, dtype='U15')
+    digitos = texto.view(np.uint32).reshape(len(texto), 15).astype(np.int64) - ord('0')
+    validas = ((digitos[:, :14] >= 0) & (digitos[:, :14] <= 9)).all(axis=1) & (digitos[:, 14] == -ord('0'))
+    return np.where(validas, digitos[:, :14] @ _PESOS_CNPJ, -1), validas
+
+
+def export_snapshot(conn, path, itersize=100000):
+    """
+    Exporta a tabela company_details para um snapshot colunar ordenado pelo CNPJ.
+
+    As linhas são lidas em streaming por um cursor do lado do servidor e gravadas direto nos
+    arquivos do snapshot, sem acumular a tabela em memória. CNPJs que não tenham 14 dígitos
+    numéricos são ignorados. A natureza jurídica é gravada como vem do banco (NULL continua nulo) e
+    o código é calculado do mesmo valor que a consulta ao banco usaria, então o snapshot classifica
+    igual ao banco; natureza maior que NATUREZA_WIDTH bytes levanta ValueError.
+
+    Args:
+    - conn: Conexão psycopg2 com o banco de dados.
+    - path (str): Diretório de destino do snapshot.
+    - itersize (int): Quantidade de linhas lidas do servidor por vez.
+
+    Returns:
+    - int: Quantidade de empresas exportadas.
+    """
+    os.makedirs(path, exist_ok=True)
+
+    total = 0
+    ignorados = 0
+    ultimo_cnpj = -1
+    offset = 0
+
+    with open(os.path.join(path, 'cnpj.int64'), 'wb') as f_cnpj, \
+            open(os.path.join(path, 'natureza_juridica.bytes'), 'wb') as f_natureza, \
+            open(os.path.join(path, 'natureza_nula.bool'), 'wb') as f_nula, \
+            open(os.path.join(path, 'natureza_codigo.int16'), 'wb') as f_codigo, \
+            open(os.path.join(path, 'empresa_razao_social.offsets'), 'wb') as f_offsets, \
+            open(os.path.join(path, 'empresa_razao_social.data'), 'wb') as f_data:
+
+        f_offsets.write(np.array([0], dtype=np.int64).tobytes())
+
+        with conn.cursor(name='export_company_details') as cursor:
+            cursor.itersize = itersize
+            cursor.execute(SQL_QUERY_EXPORT_COMPANY_DETAILS)
+
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+
+                cnpjs, naturezas, nulas, codigos, offsets, razoes = [], [], [], [], [], []
+                for cnpj, natureza, razao in rows:
+                    cnpj = (cnpj or '').strip()
+                    if len(cnpj) != 14 or not cnpj.isdigit():
+                        ignorados += 1
+                        continue
+
+                    valor = int(cnpj)
+                    if valor <= ultimo_cnpj:
+                        raise ValueError(f"company_details não está ordenada ou tem CNPJ repetido: {cnpj}")
+                    ultimo_cnpj = valor
+
+                    razao = (razao or '').encode('utf-8')
+                    offset += len(razao)
+
+                    cnpjs.append(valor)
+                    texto = (natureza or '').encode('utf-8')
+                    if len(texto) > NATUREZA_WIDTH:
+                        raise ValueError(
+                            f"Natureza jurídica com mais de {NATUREZA_WIDTH} bytes no CNPJ {cnpj}: {natureza!r}"
+                        )
+                    naturezas.append(texto)
+                    nulas.append(natureza is None)
+                    codigos.append(natureza_code(natureza))
+                    offsets.append(offset)
+                    razoes.append(razao)
+
+                f_cnpj.write(np.array(cnpjs, dtype=np.int64).tobytes())
+                f_natureza.write(np.array(naturezas, dtype=f'S{NATUREZA_WIDTH}').tobytes())
+                f_nula.write(np.array(nulas, dtype=bool).tobytes())
+                f_codigo.write(np.array(codigos, dtype=np.int16).tobytes())
+                f_offsets.write(np.array(offsets, dtype=np.int64).tobytes())
+                f_data.write(b''.join(razoes))
+                total += len(cnpjs)
+
+    conn.rollback()
+
+    with open(os.path.join(path, 'meta.json'), 'w') as f_meta:
+        json.dump({'rows': total, 'natureza_width': NATUREZA_WIDTH}, f_meta)
+
+    if ignorados:
+        logging.warning(f"{ignorados} linhas com CNPJ inválido foram ignoradas na exportação.")
+
+    return total
+
+
+class CompanySnapshot:
+    """
+    Motor de consulta sobre um snapshot exportado por export_snapshot.
+
+    A busca é binária (np.searchsorted) sobre os CNPJs int64 ordenados e totalmente vetorizada,
+    então milhões de CNPJs são resolvidos em milissegundos e sem acesso à rede.
+
+    Args:
+    - path (str): Diretório do snapshot.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f_meta:
+            meta = json.load(f_meta)
+
+        self.path = path
+        self.rows = meta['rows']
+
+        def abrir(nome, dtype, shape):
+            # np.memmap não aceita arquivos vazios
+            if shape == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(os.path.join(path, nome), dtype=dtype, mode='r', shape=(shape,))
+
+        self.cnpj = abrir('cnpj.int64', np.int64, self.rows)
+        self.natureza_juridica = abrir('natureza_juridica.bytes', f"S{meta['natureza_width']}", self.rows)
+        if os.path.exists(os.path.join(path, 'natureza_nula.bool')):
+            self.natureza_nula = abrir('natureza_nula.bool', np.bool_, self.rows)
+        else:
+            # snapshot exportado antes da máscara: o NULL do banco foi gravado como texto vazio
+            self.natureza_nula = self.natureza_juridica == b''
+        if os.path.exists(os.path.join(path, 'natureza_codigo.int16')):
+            self.natureza_codigo = abrir('natureza_codigo.int16', np.int16, self.rows)
+        else:
+            # snapshot exportado antes dos códigos: calcula uma vez, na abertura
+            self.natureza_codigo = natureza_codes(self.natureza_juridica.astype('U'))
+        self.razao_offsets = abrir('empresa_razao_social.offsets', np.int64, self.rows + 1)
+        tamanho_data = os.path.getsize(os.path.join(path, 'empresa_razao_social.data'))
+        self.razao_data = abrir('empresa_razao_social.data', np.uint8, tamanho_data)
+
+    def __len__(self):
+        return self.rows
+
+    def positions(self, cnpjs):
+        """
+        Localiza os CNPJs no snapshot.
+
+        Args:
+        - cnpjs (array-like): CNPJs como texto de 14 dígitos ou como inteiros.
+
+        Returns:
+        - np.ndarray: Posição de cada CNPJ no snapshot, ou -1 quando não encontrado.
+        """
+        chaves, validas = cnpjs_to_int64(cnpjs)
+
+        posicao = np.searchsorted(self.cnpj, chaves)
+        posicao_limitada = np.minimum(posicao, max(self.rows - 1, 0))
+        encontrado = validas & (self.rows > 0)
+        if self.rows:
+            encontrado &= self.cnpj[posicao_limitada] == chaves
+        return np.where(encontrado, posicao_limitada, -1)
+
+    def natureza_for(self, cnpjs):
+        """
+        Retorna a natureza jurídica de cada CNPJ (vetorizado).
+
+        Args:
+        - cnpjs (array-like): CNPJs a consultar.
+
+        Returns:
+        - np.ndarray: Natureza jurídica (str) de cada CNPJ, ou None quando não encontrado.
+        """
+        posicao = self.positions(cnpjs)
+        encontrado = posicao >= 0
+        resultado = np.full(len(posicao), None, dtype=object)
+        resultado[encontrado] = self._naturezas(posicao[encontrado])
+        return resultado
+
+    def _naturezas(self, posicoes):
+        """Natureza jurídica (str) nas posições informadas, com None onde ela é NULL no banco."""
+        resultado = self.natureza_juridica[posicoes].astype('U').astype(object)
+        resultado[np.asarray(self.natureza_nula[posicoes], dtype=bool)] = None
+        return resultado
+
+    def razao_social_for(self, cnpjs):
+        """
+        Retorna a razão social de cada CNPJ.
+
+        Args:
+        - cnpjs (array-like): CNPJs a consultar.
+
+        Returns:
+        - list: Razão social (str) de cada CNPJ, ou None quando não encontrado.
+        """
+        return [
+            bytes(self.razao_data[self.razao_offsets[p]:self.razao_offsets[p + 1]]).decode('utf-8') if p >= 0 else None
+            for p in self.positions(cnpjs)
+        ]
+
+    def get_details(self, cnpjs):
+        """
+        Mesmo contrato de fetch_company_details, mas resolvido localmente pelo snapshot.
+
+        Args:
+        - cnpjs (list): Lista de CNPJs para buscar os detalhes.
+
+        Returns:
+        - dict: Dicionário com detalhes da empresa, indexado pelo CNPJ.
+        """
+        cnpjs = [cnpj.strip().zfill(14) for cnpj in cnpjs if cnpj and cnpj.strip()]
+        posicao = self.positions(cnpjs)
+        encontrado = np.flatnonzero(posicao >= 0)
+        naturezas = self._naturezas(posicao[encontrado])
+        codigos = self.natureza_codigo[posicao[encontrado]].tolist()
+        return {
+            cnpjs[i]: {'natureza_juridica': natureza, 'natureza_codigo': codigo}
+            for i, natureza, codigo in zip(encontrado, naturezas, codigos)
+        }
+
+
+if __name__ == "__main__":
+    from src.common.database_utils import connect_to_db
+
+    parser = argparse.ArgumentParser(description="Exporta company_details para um snapshot local.")
+    parser.add_argument("destino", help="Diretório onde o snapshot será gravado.")
+    parser.add_argument("--itersize", type=int, default=100000, help="Linhas lidas do banco por vez.")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    if conn is None:
+        raise SystemExit("Não foi possível conectar ao banco de dados.")
+    try:
+        total = export_snapshot(conn, args.destino, itersize=args.itersize)
+    finally:
+        conn.close()
+    print(f"Snapshot gravado em: {args.destino} ({total} empresas)")
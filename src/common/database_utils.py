@@ -0,0 +1,137 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+
+def _connection_params():
+    """
+    Retorna os parâmetros de conexão com o banco de dados PostgreSQL.
+
+    Returns:
+        dict: Argumentos nomeados aceitos por psycopg2.connect.
+    """
+    return {
+        "dbname": "datamob",
+        "user": "postgres",
+        "password": "senha",
+        "host": "localhost",
+        "port": "6432",
+    }
+
+
+def connect_to_db():
+    """
+    Conecta ao banco de dados PostgreSQL usando as credenciais definidas nas variáveis de ambiente.
+
+    Returns:
+        psycopg2.extensions.connection: Objeto de conexão com o banco de dados.
+    """
+
+    try:
+        connection = psycopg2.connect(**_connection_params())
+        return connection
+    except Exception as e:
+        logging.error(f"Erro ao conectar ao banco de dados: {e}")
+        return None
+
+
+def create_pool(maxconn, minconn=1):
+    """
+    Cria um pool de conexões com o banco de dados, seguro para uso entre threads.
+
+    Args:
+        maxconn (int): Número máximo de conexões abertas ao mesmo tempo.
+        minconn (int): Número de conexões abertas já na criação do pool.
+
+    Returns:
+        psycopg2.pool.ThreadedConnectionPool: Pool de conexões.
+    """
+    return ThreadedConnectionPool(min(minconn, maxconn), maxconn, **_connection_params())
+
+
+def run_batched_query(query, keys, batch_size=1000, max_workers=4, db_pool=None):
+    """
+    Executa uma consulta com 'IN %s' para uma lista de chaves, em lotes executados em paralelo.
+
+    Cada lote roda em uma thread com sua própria conexão, obtida do pool. Se nenhum pool for
+    informado, um pool com 'max_workers' conexões é criado e fechado ao final. Com um pool
+    informado, as threads ficam limitadas ao seu 'maxconn' (o getconn do psycopg2 não espera por
+    uma conexão livre: com o pool esgotado ele levanta PoolError).
+
+    Args:
+        query (str): Consulta SQL com um único parâmetro (a tupla de chaves do lote).
+        keys (list): Lista de chaves a consultar.
+        batch_size (int): Quantidade de chaves por lote.
+        max_workers (int): Quantidade de lotes consultados ao mesmo tempo.
+        db_pool: Pool de conexões (qualquer objeto com getconn/putconn e, opcionalmente, maxconn),
+            útil para testes.
+
+    Returns:
+        list: Todas as linhas retornadas, na ordem dos lotes.
+    """
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    if not batches:
+        return []
+
+    workers = max(1, min(max_workers, len(batches)))
+    own_pool = db_pool is None
+    if own_pool:
+        db_pool = create_pool(maxconn=workers)
+    elif getattr(db_pool, "maxconn", None):
+        workers = min(workers, db_pool.maxconn)
+
+    def run_batch(batch):
+        conn = db_pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (tuple(batch),))
+                return cursor.fetchall()
+        finally:
+            # Encerra a transação de leitura antes de devolver a conexão ao pool
+            conn.rollback()
+            db_pool.putconn(conn)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rows = []
+            for batch_rows in executor.map(run_batch, batches):
+                rows.extend(batch_rows)
+            return rows
+    finally:
+        if own_pool:
+            db_pool.closeall()
+
+
+def stream_array_query(query, keys, itersize=10000, conn=None):
+    """
+    Executa uma consulta com 'ANY(%s)' enviando todas as chaves de uma vez, como um único array.
+
+    O resultado é lido por um cursor nomeado (do lado do servidor), que traz 'itersize' linhas
+    por vez, de modo que a memória do cliente não cresce com o tamanho do resultado.
+
+    Args:
+        query (str): Consulta SQL com um único parâmetro (o array de chaves).
+        keys (list): Lista de chaves a consultar.
+        itersize (int): Quantidade de linhas trazidas do servidor a cada ida ao banco.
+        conn: Conexão a reutilizar; se None, uma conexão é aberta e fechada ao final.
+
+    Yields:
+        tuple: Cada linha retornada pela consulta.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_to_db()
+        if conn is None:
+            raise ConnectionError("Não foi possível conectar ao banco de dados.")
+
+    try:
+        with conn.cursor(name="stream_array_query") as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query, (list(keys),))
+            for row in cursor:
+                yield row
+    finally:
+        conn.rollback()
+        if own_conn:
+            conn.close()
@@ -0,0 +1,108 @@
+import codecs
+import json
+import logging
+import os
+
+""" DETECÇÃO DE CODIFICAÇÃO DOS ARQUIVOS CSV, COMPARTILHADA POR TODOS OS SCRIPTS """
+
+# Cache persistente das codificações já detectadas, indexado por (caminho, tamanho, mtime)
+ENCODING_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'compare_csv', 'encodings.json')
+ENCODING_CACHE_MAX_ENTRIES = 1000
+
+# UTF-32 antes de UTF-16: o BOM UTF-32 LE começa com o BOM UTF-16 LE
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_cache_memoria = None
+
+
+def _detectar(dados):
+    """
+    Detecta a codificação de uma amostra de bytes, do caminho mais barato para o mais caro.
+
+    1. BOM no início do arquivo.
+    2. Validação estrita de UTF-8 (a amostra pode terminar no meio de um caractere).
+    3. cp1252, que cobre os exports do Windows/Excel.
+    4. chardet, apenas quando nada acima serve (ex.: bytes nulos de UTF-16 sem BOM).
+    5. latin-1, que aceita qualquer sequência de bytes.
+    """
+    for bom, codificacao in _BOMS:
+        if dados.startswith(bom):
+            return codificacao
+
+    if b'\x00' not in dados:
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(dados, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        try:
+            dados.decode('cp1252')
+            return 'cp1252'
+        except UnicodeDecodeError:
+            pass
+
+    try:
+        import chardet
+    except ImportError:
+        return 'latin-1'
+    return chardet.detect(dados)['encoding'] or 'latin-1'
+
+
+def _carregar_cache():
+    global _cache_memoria
+    if _cache_memoria is None:
+        try:
+            with open(ENCODING_CACHE_PATH, encoding='utf-8') as f:
+                _cache_memoria = json.load(f)
+        except (OSError, ValueError):
+            _cache_memoria = {}
+    return _cache_memoria
+
+
+def _salvar_cache(cache):
+    # Mantém só as entradas mais recentes para o arquivo não crescer indefinidamente
+    while len(cache) > ENCODING_CACHE_MAX_ENTRIES:
+        cache.pop(next(iter(cache)))
+    try:
+        os.makedirs(os.path.dirname(ENCODING_CACHE_PATH), exist_ok=True)
+        temporario = f"{ENCODING_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temporario, ENCODING_CACHE_PATH)
+    except OSError as e:
+        logging.debug(f"Não foi possível gravar o cache de codificações: {e}")
+
+
+def detectar_codificacao(arquivo, num_bytes=100_000, usar_cache=True):
+    """
+    Detecta a codificação de um arquivo lendo os primeiros 'num_bytes' bytes.
+
+    O resultado fica em cache por (caminho, tamanho, mtime): enquanto o arquivo não mudar,
+    as próximas execuções não leem nem analisam o arquivo de novo.
+
+    :param arquivo: Caminho para o arquivo.
+    :param num_bytes: Número de bytes a serem lidos para detecção.
+    :param usar_cache: Se False, sempre analisa o arquivo.
+    :return: Codificação detectada.
+    """
+    info = os.stat(arquivo)
+    chave = f"{os.path.abspath(arquivo)}|{info.st_size}|{info.st_mtime_ns}|{num_bytes}"
+
+    cache = _carregar_cache() if usar_cache else {}
+    if chave in cache:
+        return cache[chave]
+
+    with open(arquivo, 'rb') as f:
+        codificacao = _detectar(f.read(num_bytes))
+
+    if usar_cache:
+        cache[chave] = codificacao
+        _salvar_cache(cache)
+    return codificacao
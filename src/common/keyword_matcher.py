@@ -0,0 +1,67 @@
+import re
+
+""" BUSCA DE VÁRIAS PALAVRAS-CHAVE DE UMA SÓ VEZ NA RAZÃO SOCIAL (EX.: keywords_gov) """
+
+
+def _trie_regex(palavras):
+    """
+    Monta uma expressão regular em forma de árvore de prefixos (trie) para a lista de palavras.
+
+    Ex.: ['SESC', 'SESCOOP', 'SESI'] -> 'SES(?:C(?:OOP)?|I)'
+
+    Como os prefixos comuns são fatorados, em cada posição do texto o motor de regex percorre
+    no máximo a profundidade da árvore, escolhendo o ramo pelo próximo caractere. O custo da busca
+    cresce com o tamanho do texto e não com a quantidade de palavras-chave.
+
+    Args:
+    - palavras (list): Lista de palavras-chave.
+
+    Returns:
+    - str: Padrão regex (sem grupos de captura) que casa com qualquer uma das palavras.
+    """
+    trie = {}
+    for palavra in palavras:
+        no = trie
+        for caractere in palavra:
+            no = no.setdefault(caractere, {})
+        no[''] = {}  # marca fim de palavra
+
+    def montar(no):
+        ramos = [re.escape(caractere) + montar(filho) for caractere, filho in sorted(no.items()) if caractere]
+        if not ramos:
+            return ''
+        corpo = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+        # Se uma palavra termina neste nó, o restante do caminho é opcional
+        return f'(?:{corpo})?' if '' in no else corpo
+
+    return montar(trie)
+
+
+class KeywordMatcher:
+    """
+    Casador pré-compilado de várias palavras-chave, respeitando limites de palavra.
+
+    'ESTADO' casa com 'SECRETARIA DE ESTADO DA SAUDE', mas não com 'ESTADOS UNIDOS LTDA'.
+    Quando uma palavra-chave é prefixo de outra (ex.: 'SESC' e 'SESCOOP') vale a mais longa.
+
+    Args:
+    - keywords (list): Lista de palavras-chave (ex.: config.keywords_gov).
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+        corpo = _trie_regex(self.keywords) if self.keywords else '(?!)'
+        self.pattern = re.compile(rf'\b({corpo})\b')
+
+    def find(self, textos):
+        """
+        Retorna, para cada texto, a primeira palavra-chave encontrada (útil para auditoria).
+
+        Args:
+        - textos (pd.Series): Textos já normalizados (ex.: razão social em maiúsculas).
+
+        Returns:
+        - pd.Series: Palavra-chave encontrada em cada linha, ou NaN quando não há nenhuma.
+        """
+        return textos.str.extract(self.pattern, expand=False)
+
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+""" NATUREZA JURÍDICA COMO CÓDIGO INTEIRO PEQUENO, CALCULADO UMA VEZ NA CONSULTA/CACHE/SNAPSHOT """
+
+# Os códigos de natureza jurídica têm 4 dígitos (ex.: '1015'), então cabem em uma tabela de 10000 posições
+NATUREZA_CODES = 10000
+
+# Natureza ausente ou fora do formato (ex.: '101-5', '1015 ', vazia)
+NATUREZA_INVALIDA = -1
+
+
+def natureza_code(natureza):
+    """
+    Código inteiro de uma natureza jurídica vinda do banco como texto.
+
+    Só valem textos inteiramente numéricos (como no isdigit da classificação): '1015' -> 1015,
+    '01015' -> 1015; '101-5', ' 1015', '' ou None -> NATUREZA_INVALIDA.
+
+    Args:
+    - natureza: Natureza jurídica (texto, inteiro ou None).
+
+    Returns:
+    - int: Código entre 0 e NATUREZA_CODES - 1, ou NATUREZA_INVALIDA.
+    """
+    texto = str(natureza)
+    if texto.isascii() and texto.isdigit():
+        codigo = int(texto)
+        if codigo < NATUREZA_CODES:
+            return codigo
+    return NATUREZA_INVALIDA
+
+
+def natureza_codes(naturezas):
+    """
+    Versão vetorizada de natureza_code.
+
+    Args:
+    - naturezas (array-like): Naturezas jurídicas (texto ou None).
+
+    Returns:
+    - np.ndarray: Códigos int16 (NATUREZA_INVALIDA quando fora do formato).
+    """
+    texto = pd.Series(naturezas, dtype=object).astype(str)
+    numero = pd.to_numeric(texto.where(texto.str.fullmatch(r'[0-9]+')), errors='coerce')
+    valido = (numero < NATUREZA_CODES).to_numpy()
+    return np.where(valido, numero.fillna(NATUREZA_INVALIDA).to_numpy(), NATUREZA_INVALIDA).astype(np.int16)
+
+
+def details_natureza_code(details):
+    """Código da natureza de um item de company_details (calculado do texto se o item não o trouxer)."""
+    codigo = details.get('natureza_codigo')
+    return natureza_code(details.get('natureza_juridica')) if codigo is None else codigo
@@ -0,0 +1,164 @@
+from typing import Any, Dict, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+from src.common.keyword_matcher import KeywordMatcher
+
+""" REGRAS DE CLASSIFICAÇÃO GOVERNO/PRIVADO COMPILADAS EM PREDICADOS VETORIZADOS, AVALIADAS EM UM BITSET """
+
+# Campo avaliado sobre a razão social do arquivo; os demais vêm dos detalhes da empresa (por CNPJ)
+CAMPO_RAZAO_SOCIAL = 'razao_social'
+
+# Uma regra por bit do bitset
+MAX_REGRAS = 32
+
+# Maior valor de um conjunto de inteiros avaliado por tabela de consulta (acima disso, np.isin)
+MAX_TABELA = 1 << 16
+
+
+class Rule(NamedTuple):
+    """Regra que classifica a linha como GOVERNO.
+
+    name: motivo gravado na saída quando a regra casa.
+    field: campo avaliado: 'cnpj', 'razao_social' ou um campo dos detalhes da empresa fornecido
+           pela origem ('natureza_juridica', 'natureza_codigo').
+    op: 'in' (valor em value), 'keyword' (alguma palavra de value, palavra inteira),
+        '>=' ou '<=' (comparação numérica com value).
+    value: conjunto (frozenset/tuple) ou limite numérico. Conjuntos de inteiros sobre um campo
+           inteiro (ex.: 'natureza_codigo') viram uma tabela booleana indexada pelo código; sobre
+           texto comparam o código numérico (só dígitos); os demais conjuntos comparam texto.
+    """
+    name: str
+    field: str
+    op: str
+    value: Any
+
+
+def _tabela_consulta(valores):
+    """
+    Tabela booleana indexada pelo código (até 10000 posições para a natureza jurídica), com uma
+    posição extra, sempre False, para os códigos fora da tabela (negativos ou maiores).
+    """
+    tamanho = max(max(valores) + 1, 0)
+    tabela = np.zeros(tamanho + 1, dtype=bool)
+    tabela[[v for v in valores if v >= 0]] = True
+
+    def consultar(codigos):
+        codigos = np.asarray(codigos, dtype=np.int64)
+        fora = (codigos < 0) | (codigos >= tamanho)
+        return tabela[np.where(fora, tamanho, codigos)]
+    return consultar
+
+
+def _predicado_in(valores):
+    valores = frozenset(valores)
+    if valores and all(isinstance(v, (int, np.integer)) for v in valores):
+        inteiros = frozenset(int(v) for v in valores)
+        consultar = _tabela_consulta(inteiros) if max(inteiros) < MAX_TABELA else None
+
+        def avaliar(serie):
+            if pd.api.types.is_integer_dtype(serie.dtype):
+                # campo já em código inteiro: um único gather na tabela
+                codigos = serie.to_numpy()
+                if consultar is not None:
+                    return consultar(codigos), None
+                return np.isin(codigos, list(inteiros)), None
+            # texto: apenas códigos numéricos (ex.: '1015'); ' 1015' ou '101-5' não casam
+            texto = serie.astype(str)
+            codigo = pd.to_numeric(texto.where(texto.str.isdigit()), errors='coerce')
+            return codigo.isin(inteiros).to_numpy(), None
+    else:
+        def avaliar(serie):
+            return serie.isin(valores).to_numpy(), None
+    return avaliar
+
+
+def _predicado_keyword(palavras):
+    matcher = KeywordMatcher(palavras)
+
+    def avaliar(serie):
+        # a palavra encontrada acompanha o resultado, para auditoria
+        encontrada = matcher.find(serie)
+        return encontrada.notna().to_numpy(), encontrada
+    return avaliar
+
+
+def _predicado_limite(op, limite):
+    def avaliar(serie):
+        numero = pd.to_numeric(serie, errors='coerce')
+        casa = numero >= limite if op == '>=' else numero <= limite
+        return casa.fillna(False).to_numpy(dtype=bool), None
+    return avaliar
+
+
+def _compilar(regra):
+    if regra.op == 'in':
+        return _predicado_in(regra.value)
+    if regra.op == 'keyword':
+        return _predicado_keyword(regra.value)
+    if regra.op in ('>=', '<='):
+        return _predicado_limite(regra.op, regra.value)
+    raise ValueError(f"Operador de regra desconhecido: {regra.op!r} (regra {regra.name})")
+
+
+class RuleSet:
+    """
+    Conjunto de regras compilado: cada regra ocupa um bit e a avaliação devolve um bitset por valor.
+
+    As regras são avaliadas sobre tabelas de valores distintos (um CNPJ ou uma razão social por
+    linha), então o custo não depende de quantas vezes cada valor se repete no arquivo. O tipo e o
+    motivo de cada linha saem depois do bitset, sem uma atribuição df.loc por regra.
+
+    Args:
+    - rules (iterable): Regras (Rule), na ordem de prioridade do motivo.
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        if len(self.rules) > MAX_REGRAS:
+            raise ValueError(f"No máximo {MAX_REGRAS} regras por conjunto ({len(self.rules)} informadas).")
+        self._predicados = [_compilar(regra) for regra in self.rules]
+
+    @property
+    def fields(self):
+        """Campos usados pelas regras, sem repetição e na ordem das regras."""
+        return tuple(dict.fromkeys(regra.field for regra in self.rules))
+
+    def evaluate(self, fatos: Dict[str, pd.Series]) -> Tuple[np.ndarray, Dict[str, pd.Series]]:
+        """
+        Avalia, em uma passada, as regras cujos campos estão em 'fatos'.
+
+        Args:
+        - fatos (dict): {campo: pd.Series}, todas do mesmo tamanho (um valor distinto por posição).
+
+        Returns:
+        - tuple: (bitset np.uint32 por posição, {nome da regra: detalhe}), em que o detalhe é a
+          palavra-chave encontrada, nas regras 'keyword'.
+        """
+        tamanho = len(next(iter(fatos.values()))) if fatos else 0
+        bits = np.zeros(tamanho, dtype=np.uint32)
+        detalhes = {}
+        for i, (regra, avaliar) in enumerate(zip(self.rules, self._predicados)):
+            if regra.field not in fatos:
+                continue
+            casa, detalhe = avaliar(fatos[regra.field])
+            bits |= casa.astype(np.uint32) << np.uint32(i)
+            if detalhe is not None:
+                detalhes[regra.name] = detalhe
+        return bits, detalhes
+
+    def tipo(self, bits):
+        """'GOVERNO' onde alguma regra casou, 'PRIVADO' nas demais."""
+        return np.where(bits != 0, 'GOVERNO', 'PRIVADO').astype(object)
+
+    def motivo(self, bits):
+        """
+        Nomes das regras que casaram, separados por '|' (None quando nenhuma casou).
+        O texto é montado uma vez por combinação distinta de bits e propagado para as linhas.
+        """
+        combinacoes, codigos = np.unique(bits, return_inverse=True)
+        textos = np.array([
+            '|'.join(regra.name for i, regra in enumerate(self.rules) if int(combinacao) >> i & 1) or None
+            for combinacao in combinacoes
+        ], dtype=object)
+        return textos[codigos.reshape(-1)]
@@ -0,0 +1,317 @@
+import codecs
+import csv
+import io
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src.common.encoding import detectar_codificacao
+from src.compare_count_tim.compare_csv_filtro_mes_plan import normalizar_status
+from src.compare_count_tim.filtro_data import ano_mes
+from src.compare_count_tim.leitor import ler_colunas
+
+""" --------- ARQUIVO CSV --------- """
+""" MOTOR DE AGREGAÇÃO: LÊ O ARQUIVO DATAMOB UMA ÚNICA VEZ E CALCULA VÁRIAS CONTAGENS NA MESMA PASSADA
+    (por status, sncode, mês de data_status, plano x status), cada uma com seus próprios filtros.
+    Substitui rodar compare.py, compare_csv_total.py, compare_csv_filtro_mes.py e
+    compare_csv_filtro_mes_plan.py separadamente (quatro leituras do mesmo arquivo).
+"""
+
+Contagem = Dict[Tuple[str, ...], int]
+
+# Tamanho mínimo de cada faixa do arquivo no modo paralelo (arquivos menores rodam em um só processo)
+TAMANHO_MINIMO_FAIXA = 8 * 1024 * 1024
+
+
+class Relatorio(NamedTuple):
+    """Definição declarativa de uma contagem.
+
+    campos: colunas derivadas usadas no agrupamento (ver CAMPOS).
+    status: se definido, conta apenas linhas com esse status (strip + lower).
+    ano/mes: se definidos, conta apenas linhas com data_status nesse mês/ano (linhas com data inválida são ignoradas).
+    """
+    campos: Tuple[str, ...]
+    status: Optional[str] = None
+    ano: Optional[int] = None
+    mes: Optional[int] = None
+
+
+class Campo(NamedTuple):
+    """Coluna derivada: coluna do arquivo de onde vem, se ela é obrigatória e a função aplicada ao valor."""
+    coluna: str
+    obrigatoria: bool
+    funcao: Callable[[str], Any]
+
+
+def _ano_mes(data_status: str) -> Optional[Tuple[int, int]]:
+    """Retorna (ano, mês) de data_status no formato dd/mm/aaaa, ou None se a data for inválida."""
+    return ano_mes(data_status.strip())
+
+
+def _mes(data_status: str) -> str:
+    resultado = _ano_mes(data_status)
+    return f"{resultado[0]:04d}-{resultado[1]:02d}" if resultado else 'data_invalida'
+
+
+# Colunas derivadas disponíveis para agrupamento. Colunas não obrigatórias ausentes no arquivo valem ''
+CAMPOS = {
+    'status': Campo('status', True, lambda status: status.strip().lower()),
+    'status_normalizado': Campo('status', False, normalizar_status),
+    'sncode': Campo('sncode', True, lambda sncode: sncode),
+    'plano': Campo('sncode', False, lambda sncode: sncode.strip() or 'SEM_PLANO'),
+    'mes': Campo('data_status', False, _mes),
+    'ano_mes': Campo('data_status', False, _ano_mes),
+}
+
+
+def relatorios_padrao(ano: int, mes: int) -> Dict[str, Relatorio]:
+    """Os quatro relatórios dos scripts individuais, para rodar todos na mesma leitura."""
+    return {
+        # compare.py: linhas por sncode com status 'a'
+        'sncode_ativos': Relatorio(campos=('sncode',), status='a'),
+        # compare_csv_total.py: linhas por status
+        'status': Relatorio(campos=('status',)),
+        # compare_csv_filtro_mes.py: linhas por status no mês/ano
+        'status_mes': Relatorio(campos=('status',), ano=ano, mes=mes),
+        # compare_csv_filtro_mes_plan.py: linhas por plano x status no mês/ano
+        'plano_status_mes': Relatorio(campos=('plano', 'status_normalizado'), ano=ano, mes=mes),
+    }
+
+
+def _campos_usados(relatorios: Dict[str, Relatorio]) -> List[str]:
+    """Campos derivados usados nos agrupamentos e filtros, sem repetição e em ordem estável."""
+    usados: Dict[str, None] = {}
+    for relatorio in relatorios.values():
+        if relatorio.status is not None:
+            usados['status'] = None
+        if relatorio.ano is not None:
+            usados['ano_mes'] = None
+        for campo in relatorio.campos:
+            usados[campo] = None
+    return list(usados)
+
+
+def colunas_necessarias(relatorios: Dict[str, Relatorio]) -> Tuple[List[str], Set[str]]:
+    """
+    Colunas do arquivo que precisam ser lidas para calcular os relatórios.
+
+    :param relatorios: Relatórios a calcular.
+    :return: (colunas, colunas opcionais), para usar com leitor.ler_colunas.
+    """
+    colunas: Dict[str, bool] = {}
+    for nome in _campos_usados(relatorios):
+        campo = CAMPOS[nome]
+        colunas[campo.coluna] = colunas.get(campo.coluna, False) or campo.obrigatoria
+    return list(colunas), {coluna for coluna, obrigatoria in colunas.items() if not obrigatoria}
+
+
+def agregar_linhas(linhas: Iterable[Tuple[str, ...]], colunas: List[str],
+                   relatorios: Dict[str, Relatorio]) -> Dict[str, Contagem]:
+    """
+    Calcula todas as contagens pedidas percorrendo as linhas uma única vez.
+
+    :param linhas: Tuplas com os valores das 'colunas' (ex.: leitor.ler_colunas).
+    :param colunas: Nomes das colunas de cada tupla (ver colunas_necessarias).
+    :param relatorios: Relatórios a calcular, indexados pelo nome.
+    :return: Contagens por relatório, indexadas pela tupla de valores dos campos.
+    """
+    contagens: Dict[str, Contagem] = {nome: defaultdict(int) for nome in relatorios}
+
+    # Cada campo derivado é calculado uma única vez por linha, mesmo se usado por vários relatórios
+    usados = _campos_usados(relatorios)
+    indice = {nome: i for i, nome in enumerate(usados)}
+    extratores = [(CAMPOS[nome].funcao, colunas.index(CAMPOS[nome].coluna)) for nome in usados]
+
+    planos = [
+        (
+            contagens[nome],
+            indice['status'] if relatorio.status is not None else None,
+            relatorio.status,
+            indice['ano_mes'] if relatorio.ano is not None else None,
+            (relatorio.ano, relatorio.mes),
+            [indice[campo] for campo in relatorio.campos],
+        )
+        for nome, relatorio in relatorios.items()
+    ]
+
+    for linha in linhas:
+        valores = [funcao(linha[i]) for funcao, i in extratores]
+        for contagem, i_status, status, i_ano_mes, alvo, indices in planos:
+            if i_status is not None and valores[i_status] != status:
+                continue
+            if i_ano_mes is not None and valores[i_ano_mes] != alvo:
+                continue
+            contagem[tuple([valores[i] for i in indices])] += 1
+
+    return contagens
+
+
+def _ler_cabecalho(input_file: str, codificacao: str) -> Tuple[List[str], int]:
+    """Retorna os nomes das colunas e a posição (em bytes) onde começa a primeira linha de dados."""
+    with open(input_file, mode='rb') as file:
+        primeira_linha = file.readline()
+    cabecalho = next(csv.reader([primeira_linha.decode(codificacao)], delimiter=';'), [])
+    return cabecalho, len(primeira_linha)
+
+
+def _faixas(input_file: str, inicio_dados: int, partes: int) -> List[Tuple[int, int]]:
+    """
+    Divide o arquivo em 'partes' faixas de bytes, cada uma começando no início de uma linha.
+
+    :param input_file: Caminho para o arquivo.
+    :param inicio_dados: Posição da primeira linha de dados (logo após o cabeçalho).
+    :param partes: Quantidade desejada de faixas.
+    :return: Lista de (início, fim) em bytes.
+    """
+    tamanho = os.path.getsize(input_file)
+    cortes = [inicio_dados]
+    with open(input_file, mode='rb') as file:
+        for i in range(1, partes):
+            alvo = inicio_dados + (tamanho - inicio_dados) * i // partes
+            if alvo <= cortes[-1]:
+                continue
+            # Avança até o fim da linha em que o corte caiu
+            file.seek(alvo - 1)
+            file.readline()
+            corte = file.tell()
+            if cortes[-1] < corte < tamanho:
+                cortes.append(corte)
+    cortes.append(tamanho)
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+class _FaixaDeBytes(io.RawIOBase):
+    """Arquivo binário somente leitura que termina na posição 'fim' (usado para ler uma faixa do arquivo)."""
+
+    def __init__(self, file, fim: int):
+        self._file = file
+        self._restante = fim - file.tell()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._restante <= 0:
+            return 0
+        lidos = self._file.readinto(memoryview(buffer)[:self._restante])
+        self._restante -= lidos
+        return lidos
+
+
+def _agregar_faixa(input_file: str, codificacao: str, cabecalho: List[str], inicio: int, fim: int,
+                   relatorios: Dict[str, Relatorio]) -> Dict[str, Contagem]:
+    """Conta uma faixa de bytes do arquivo (executado em um processo do pool)."""
+    with open(input_file, mode='rb', buffering=0) as bruto:
+        bruto.seek(inicio)
+        # Mesma decodificação e tratamento de quebras de linha do open(..., mode='r') da leitura serial
+        file = io.TextIOWrapper(io.BufferedReader(_FaixaDeBytes(bruto, fim)), encoding=codificacao)
+        colunas, opcionais = colunas_necessarias(relatorios)
+        return agregar_linhas(ler_colunas(file, colunas, opcionais, cabecalho=cabecalho), colunas, relatorios)
+
+
+def _paralelizavel(codificacao: str) -> bool:
+    """Codificações de largura variável com bytes nulos (UTF-16/32) não podem ser cortadas em '\\n'."""
+    nome = codecs.lookup(codificacao).name
+    return not nome.startswith(('utf-16', 'utf-32'))
+
+
+def agregar(input_file: str, relatorios: Dict[str, Relatorio], codificacao: Optional[str] = None,
+            processos: Optional[int] = None) -> Dict[str, Contagem]:
+    """
+    Lê o arquivo uma única vez e calcula todas as contagens pedidas.
+
+    Com 'processos' > 1 o arquivo é dividido em faixas de bytes alinhadas ao início das linhas,
+    cada faixa é contada em um processo separado e as contagens parciais são somadas na ordem
+    das faixas. O resultado (inclusive a ordem das chaves) é igual ao da leitura serial, desde
+    que nenhum campo tenha quebra de linha dentro de aspas.
+
+    :param input_file: Caminho para o arquivo.
+    :param relatorios: Relatórios a calcular, indexados pelo nome.
+    :param codificacao: Codificação do arquivo; se None, é detectada.
+    :param processos: Quantidade de processos; None ou 1 = leitura serial.
+    :return: Contagens por relatório.
+    """
+    codificacao = codificacao or detectar_codificacao(input_file, num_bytes=100_000)
+
+    partes = 1
+    if processos and processos > 1 and _paralelizavel(codificacao):
+        partes = min(processos, max(1, os.path.getsize(input_file) // TAMANHO_MINIMO_FAIXA))
+
+    if partes <= 1:
+        with open(input_file, mode='r', encoding=codificacao) as file:
+            colunas, opcionais = colunas_necessarias(relatorios)
+            return agregar_linhas(ler_colunas(file, colunas, opcionais), colunas, relatorios)
+
+    cabecalho, inicio_dados = _ler_cabecalho(input_file, codificacao)
+    faixas = _faixas(input_file, inicio_dados, partes)
+
+    with ProcessPoolExecutor(max_workers=len(faixas)) as executor:
+        futuros = [
+            executor.submit(_agregar_faixa, input_file, codificacao, cabecalho, inicio, fim, relatorios)
+            for inicio, fim in faixas
+        ]
+        parciais = [futuro.result() for futuro in futuros]
+
+    # Soma na ordem das faixas: as chaves ficam na ordem em que aparecem no arquivo, como na leitura serial
+    contagens: Dict[str, Contagem] = {nome: defaultdict(int) for nome in relatorios}
+    for parcial in parciais:
+        for nome, contagem in parcial.items():
+            for chave, quantidade in contagem.items():
+                contagens[nome][chave] += quantidade
+    return contagens
+
+
+def somar_por(contagem: Contagem, posicao: int) -> Dict[str, int]:
+    """Soma uma contagem agrupada por vários campos mantendo só o campo da posição indicada."""
+    total: Dict[str, int] = defaultdict(int)
+    for chave, quantidade in contagem.items():
+        total[chave[posicao]] += quantidade
+    return total
+
+
+def main(input_file: str, ano: int = 2025, mes: int = 6, processos: Optional[int] = None) -> None:
+    try:
+        codificacao = detectar_codificacao(input_file, num_bytes=100_000)
+        print(f"Codificação detectada: {codificacao}")
+
+        contagens = agregar(input_file, relatorios_padrao(ano, mes), codificacao=codificacao, processos=processos)
+
+        print("\nContagem de linhas por sncode com status 'a':")
+        for (sncode,), contagem in contagens['sncode_ativos'].items():
+            print(f"SNCode: {sncode} - Contagem: {contagem}")
+
+        print("\nContagem de linhas por status:")
+        for (status,), contagem in contagens['status'].items():
+            print(f"Status: {status} - Contagem: {contagem}")
+
+        print(f"\nContagem de linhas por status para {mes:02d}/{ano}:")
+        for (status,), contagem in contagens['status_mes'].items():
+            print(f"Status: {status} - Contagem: {contagem}")
+
+        plano_status = contagens['plano_status_mes']
+        por_plano = somar_por(plano_status, 0)
+        print(f"\nContagem por PLANO (sncode) para {mes:02d}/{ano}:")
+        for plano in sorted(por_plano, key=lambda p: (-por_plano[p], p)):
+            print(f"\nPlano: {plano} — Total: {por_plano[plano]}")
+            status_do_plano = {s: c for (p, s), c in plano_status.items() if p == plano}
+            for status in sorted(status_do_plano, key=lambda s: (-status_do_plano[s], s)):
+                print(f"  {status}: {status_do_plano[status]}")
+
+        por_status = somar_por(plano_status, 1)
+        print(f"\nResumo GERAL por status em {mes:02d}/{ano}:")
+        for status in sorted(por_status, key=lambda s: (-por_status[s], s)):
+            print(f"  {status}: {por_status[status]}")
+
+    except FileNotFoundError:
+        print(f"Erro: O arquivo '{input_file}' não foi encontrado.")
+    except KeyError as e:
+        print(f"Erro: A coluna {e} não foi encontrada no arquivo.")
+    except Exception as e:
+        print(f"Ocorreu um erro: {e}")
+
+
+if __name__ == "__main__":
+    # Ajuste o caminho e o filtro de data conforme necessário
+    main("/home/victor-sims/Desktop/Compare_CSV/data_tim/DATAMOB_6793_Mai_25.csv", ano=2025, mes=6,
+         processos=os.cpu_count())
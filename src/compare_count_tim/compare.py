@@ -1,23 +1,10 @@
-import csv
 from collections import defaultdict
-import chardet
+from src.common.encoding import detectar_codificacao
+from src.compare_count_tim.leitor import ler_colunas
 
 """" --------- ARQUIVO TXT --------- """
 """" CODIGO FILTRA PELO STATUS SELECIONADO NA LINHA 34 E AGRUPA OS VALORES CONTANDO AS LINHAS """
 
-def detectar_codificacao(arquivo, num_bytes=100000):
-    """
-    Detecta a codificação de um arquivo lendo os primeiros 'num_bytes' bytes.
-
-    :param arquivo: Caminho para o arquivo.
-    :param num_bytes: Número de bytes a serem lidos para detecção.
-    :return: Codificação detectada.
-    """
-    with open(arquivo, 'rb') as f:
-        dados = f.read(num_bytes)
-        resultado = chardet.detect(dados)
-        return resultado['encoding']
-
 def main(input_file):
     # Detectar a codificação lendo os primeiros 100.000 bytes
     codificacao = detectar_codificacao(input_file, num_bytes=100000)
@@ -28,11 +15,10 @@ def main(input_file):
 
     try:
         with open(input_file, mode='r', encoding=codificacao) as file:
-            leitor = csv.DictReader(file, delimiter=';')
-            for linha in leitor:
+            # Lê só as colunas usadas, como tuplas (sem montar um dict por linha)
+            for status, sncode in ler_colunas(file, ('status', 'sncode')):
                 # Verifica se o status é 'a' (ativo), ignorando espaços e maiúsculas/minúsculas
-                if linha['status'].strip().lower() == 'a':
-                    sncode = linha['sncode']
+                if status.strip().lower() == 'a':
                     contagem_sncode[sncode] += 1
 
         # Exibir os resultados
@@ -1,26 +1,12 @@
-import csv
 from collections import defaultdict
-import chardet
-from datetime import datetime
+from src.common.encoding import detectar_codificacao
+from src.compare_count_tim.filtro_data import FiltroMes
+from src.compare_count_tim.leitor import ler_colunas
 
 """" --------- ARQUIVO CSV --------- """
 """" CODIGO FILTRA PELO MES SELECIONADO NA LINHA 40 E AGRUPA OS VALORES POR STATUS CONTANDO AS LINHAS """
 
 
-def detectar_codificacao(arquivo, num_bytes=100000):
-    """
-    Detecta a codificação de um arquivo lendo os primeiros 'num_bytes' bytes.
-
-    :param arquivo: Caminho para o arquivo.
-    :param num_bytes: Número de bytes a serem lidos para detecção.
-    :return: Codificação detectada.
-    """
-    with open(arquivo, 'rb') as f:
-        dados = f.read(num_bytes)
-        resultado = chardet.detect(dados)
-        return resultado['encoding']
-
-
 def main(input_file):
     # Detectar a codificação lendo os primeiros 100.000 bytes
     codificacao = detectar_codificacao(input_file, num_bytes=100000)
@@ -29,26 +15,23 @@ def main(input_file):
     # Dicionário para armazenar a contagem por status
     contagem_status = defaultdict(int)
 
+    # Filtro de mês/ano sem strptime por linha (datas inválidas são contadas e ignoradas)
+    filtro_mes = FiltroMes(ano=2025, mes=8)
+
     try:
         with open(input_file, mode='r', encoding=codificacao) as file:
-            leitor = csv.DictReader(file, delimiter=';')
-            for linha in leitor:
+            # Lê só as colunas usadas, como tuplas (sem montar um dict por linha)
+            for data_status, status in ler_colunas(file, ('data_status', 'status'), opcionais={'data_status'}):
                 # Verificar e filtrar linhas com data_status no mês 12 de 2024
-                data_status = linha.get('data_status', '').strip()
-                try:
-                    data = datetime.strptime(data_status, '%d/%m/%Y')
-                    if data.year == 2025 and data.month == 8:
-                        # Agrupar e contar os valores de status
-                        status = linha['status'].strip().lower()
-                        contagem_status[status] += 1
-                except ValueError:
-                    # Ignorar linhas com data inválida
-                    pass
+                if filtro_mes(data_status.strip()):
+                    # Agrupar e contar os valores de status
+                    contagem_status[status.strip().lower()] += 1
 
         # Exibir os resultados
         print("Contagem de linhas por status para o mês de junho de 2025:")
         for status, contagem in contagem_status.items():
             print(f"Status: {status} - Contagem: {contagem}")
+        print(f"Linhas ignoradas por data inválida: {filtro_mes.invalidas}")
 
     except FileNotFoundError:
         print(f"Erro: O arquivo '{input_file}' não foi encontrado.")
@@ -1,8 +1,8 @@
-import csv
 from collections import defaultdict
-import chardet
-from datetime import datetime
+from src.common.encoding import detectar_codificacao
 from typing import Dict
+from src.compare_count_tim.filtro_data import FiltroMes
+from src.compare_count_tim.leitor import ler_colunas
 
 """ --------- ARQUIVO CSV --------- """
 """ CÓDIGO FILTRA PELO MÊS/ANO DEFINIDOS E:
@@ -11,20 +11,6 @@ from typing import Dict
 """
 
 
-def detectar_codificacao(arquivo: str, num_bytes: int = 100_000) -> str:
-    """
-    Detecta a codificação de um arquivo lendo os primeiros 'num_bytes' bytes.
-
-    :param arquivo: Caminho para o arquivo.
-    :param num_bytes: Número de bytes a serem lidos para detecção.
-    :return: Codificação detectada.
-    """
-    with open(arquivo, 'rb') as f:
-        dados = f.read(num_bytes)
-        resultado = chardet.detect(dados)
-        return resultado['encoding']
-
-
 def normalizar_status(status_raw: str) -> str:
     """Normaliza o status para facilitar a leitura.
     Mapeia variações comuns de ativo/inativo.
@@ -51,22 +37,18 @@ def main(input_file: str, ano: int = 2025, mes: int = 6) -> None:
     contagem_por_plano_status: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
     contagem_status_geral: Dict[str, int] = defaultdict(int)
 
+    # Filtro de mês/ano sem strptime por linha (datas inválidas são contadas e ignoradas)
+    filtro_mes = FiltroMes(ano, mes)
+
     try:
         with open(input_file, mode='r', encoding=codificacao) as file:
-            leitor = csv.DictReader(file, delimiter=';')
-            for linha in leitor:
+            # Lê só as colunas usadas, como tuplas (sem montar um dict por linha)
+            colunas = ('data_status', 'sncode', 'status')
+            for data_status, sncode, status_raw in ler_colunas(file, colunas, opcionais=set(colunas)):
                 # Filtrar pelo mês/ano desejados
-                data_status = (linha.get('data_status') or '').strip()
-                try:
-                    data = datetime.strptime(data_status, '%d/%m/%Y')
-                except ValueError:
-                    # Ignorar linhas com data inválida
-                    continue
-
-                if data.year == ano and data.month == mes:
-                    plano = (linha.get('sncode') or '').strip() or 'SEM_PLANO'
-                    status_raw = (linha.get('status') or '').strip()
-                    status = normalizar_status(status_raw)
+                if filtro_mes(data_status.strip()):
+                    plano = sncode.strip() or 'SEM_PLANO'
+                    status = normalizar_status(status_raw.strip())
 
                     contagem_por_plano[plano] += 1
                     contagem_por_plano_status[plano][status] += 1
@@ -92,6 +74,8 @@ def main(input_file: str, ano: int = 2025, mes: int = 6) -> None:
         for status in sorted(contagem_status_geral.keys(), key=lambda s: (-contagem_status_geral[s], s)):
             print(f"  {status}: {contagem_status_geral[status]}")
 
+        print(f"\nLinhas ignoradas por data inválida: {filtro_mes.invalidas}")
+
     except FileNotFoundError:
         print(f"Erro: O arquivo '{input_file}' não foi encontrado.")
     except KeyError as e:
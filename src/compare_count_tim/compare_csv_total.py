@@ -1,24 +1,10 @@
-import csv
-import chardet
+from src.common.encoding import detectar_codificacao
+from src.compare_count_tim.leitor import ler_colunas
 from collections import defaultdict
 
 """" --------- ARQUIVO CSV --------- """
 """" CODIGO AGRUPA A COLUNA STATUS E CONTA A QUANTIDADE DE LINHAS DE CADA STATUS """
 
-def detectar_codificacao(arquivo, num_bytes=100000):
-    """
-    Detecta a codificação de um arquivo lendo os primeiros 'num_bytes' bytes.
-
-    :param arquivo: Caminho para o arquivo.
-    :param num_bytes: Número de bytes a serem lidos para detecção.
-    :return: Codificação detectada.
-    """
-    with open(arquivo, 'rb') as f:
-        dados = f.read(num_bytes)
-        resultado = chardet.detect(dados)
-        return resultado['encoding']
-
-
 def main(input_file):
     # Detectar a codificação lendo os primeiros 100.000 bytes
     codificacao = detectar_codificacao(input_file, num_bytes=100000)
@@ -29,11 +15,10 @@ def main(input_file):
 
     try:
         with open(input_file, mode='r', encoding=codificacao) as file:
-            leitor = csv.DictReader(file, delimiter=';')
-            for linha in leitor:
+            # Lê só a coluna usada, como tupla (sem montar um dict por linha)
+            for (status,) in ler_colunas(file, ('status',)):
                 # Obtém o valor da coluna 'status', ignorando espaços e considerando maiúsculas/minúsculas
-                status = linha['status'].strip().lower()
-                contagem_status[status] += 1
+                contagem_status[status.strip().lower()] += 1
 
         # Exibir os resultados
         print("Contagem de linhas por status:")
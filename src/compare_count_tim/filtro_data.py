@@ -0,0 +1,49 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+""" FILTRO RÁPIDO POR MÊS/ANO DA COLUNA data_status (dd/mm/aaaa) """
+
+
+@lru_cache(maxsize=100_000)
+def ano_mes(data_status: str) -> Optional[Tuple[int, int]]:
+    """
+    Retorna (ano, mês) de uma data no formato dd/mm/aaaa, ou None se a data for inválida.
+
+    Um arquivo DATAMOB tem milhões de linhas mas poucos milhares de datas distintas, então o
+    resultado é memorizado pelo texto bruto: o datetime.strptime roda uma vez por data distinta
+    e as demais linhas custam apenas uma consulta ao cache. A validação é a mesma do strptime
+    (ex.: 31/02/2025 continua inválida).
+
+    :param data_status: Texto da data, já sem espaços nas pontas.
+    :return: Tupla (ano, mês) ou None.
+    """
+    try:
+        data = datetime.strptime(data_status, '%d/%m/%Y')
+    except ValueError:
+        return None
+    return data.year, data.month
+
+
+class FiltroMes:
+    """
+    Filtra linhas pelo mês/ano de data_status, contando quantas foram ignoradas por data inválida.
+
+    :param ano: Ano desejado.
+    :param mes: Mês desejado (1 a 12).
+    """
+
+    def __init__(self, ano: int, mes: int):
+        self.alvo = (ano, mes)
+        self.invalidas = 0
+
+    def __call__(self, data_status: str) -> bool:
+        """
+        :param data_status: Texto da data, já sem espaços nas pontas.
+        :return: True se a data for válida e estiver no mês/ano desejado.
+        """
+        resultado = ano_mes(data_status)
+        if resultado is None:
+            self.invalidas += 1
+            return False
+        return resultado == self.alvo
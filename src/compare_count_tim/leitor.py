@@ -0,0 +1,59 @@
+import csv
+from operator import itemgetter
+from typing import Collection, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+""" LEITOR RÁPIDO: DEVOLVE SÓ AS COLUNAS NECESSÁRIAS COMO TUPLAS, SEM MONTAR UM DICT POR LINHA """
+
+
+def ler_colunas(file: TextIO, colunas: Sequence[str], opcionais: Collection[str] = (),
+                delimiter: str = ';', cabecalho: Optional[List[str]] = None) -> Iterator[Tuple[str, ...]]:
+    """
+    Lê um CSV devolvendo, para cada linha, uma tupla apenas com as colunas pedidas.
+
+    Os índices das colunas são resolvidos uma única vez a partir do cabeçalho, então cada linha
+    custa só o csv.reader e um itemgetter (o csv.DictReader monta um dict com todas as colunas).
+
+    :param file: Arquivo aberto em modo texto.
+    :param colunas: Nomes das colunas desejadas, na ordem em que devem aparecer na tupla.
+    :param opcionais: Colunas que podem não existir no arquivo; nesse caso vêm como ''.
+    :param delimiter: Separador de campos.
+    :param cabecalho: Nomes das colunas, quando o arquivo já está posicionado depois do cabeçalho.
+    :return: Iterador de tuplas.
+    :raises KeyError: Se uma coluna obrigatória não existir no cabeçalho (mesma exceção do DictReader).
+    """
+    leitor = csv.reader(file, delimiter=delimiter)
+    if cabecalho is None:
+        cabecalho = next(leitor, None)
+        if cabecalho is None:
+            return
+
+    # Em colunas repetidas vale a última, como no DictReader
+    posicoes = {nome: i for i, nome in enumerate(cabecalho)}
+    indices = []
+    for coluna in colunas:
+        if coluna in posicoes:
+            indices.append(posicoes[coluna])
+        elif coluna in opcionais:
+            # Coluna ausente aponta para uma posição extra, preenchida com '' abaixo
+            indices.append(len(cabecalho))
+        else:
+            raise KeyError(coluna)
+
+    if not indices:
+        for linha in leitor:
+            if linha:
+                yield ()
+        return
+
+    pegar = itemgetter(*indices)
+    largura = max(indices) + 1
+    unica = len(indices) == 1
+
+    for linha in leitor:
+        # Linhas em branco são ignoradas, como no DictReader
+        if not linha:
+            continue
+        if len(linha) < largura:
+            linha = linha + [''] * (largura - len(linha))
+        valores = pegar(linha)
+        yield (valores,) if unica else valores
@@ -1,124 +1,62 @@
-import logging
-import pandas as pd
-from src.compare_vivo_GVI.database_utils import connect_to_db
-from src.compare_vivo_GVI.config import gov_naturezas, gov_exceptions_cnpjs, keywords_gov
+from src.common import classification
+from src.compare_vivo_VGI.config import PROFILE_VIVO_VGI_KEYWORDS, DB_BATCH_SIZE, DB_MAX_WORKERS, DB_LOOKUP_MODE, COMPANY_SNAPSHOT_PATH
 
 """ USA A RAZAO SOCIAL COMO PARAMETRO PARA FAZER A CLASSIFICACAO """
+""" A classificação fica no motor único (src/common/classification.py); aqui só o perfil da Vivo VGI com palavras-chave """
 
-def fetch_company_details(cnpjs, batch_size=1000):
+
+def fetch_company_details(cnpjs, batch_size=DB_BATCH_SIZE, use_cache=True, max_workers=DB_MAX_WORKERS, db_pool=None,
+                          mode=DB_LOOKUP_MODE):
     """
-    Busca detalhes da empresa no banco de dados para uma lista de CNPJs, em lotes.
+    Busca detalhes da empresa no banco de dados para uma lista de CNPJs (ver classification.fetch_company_details).
 
     Args:
     - cnpjs (list): Lista de CNPJs para buscar os detalhes.
     - batch_size (int): Tamanho do lote para as consultas.
+    - use_cache (bool): Se False, ignora o cache local e consulta todos os CNPJs no banco.
+    - max_workers (int): Quantidade de lotes consultados ao mesmo tempo.
+    - db_pool: Pool de conexões a reutilizar no modo 'batch'; se None, um pool é criado para a chamada.
+    - mode (str): 'bulk' (uma única ida ao banco) ou 'batch' (lotes 'IN' em paralelo).
 
     Returns:
     - dict: Dicionário com detalhes da empresa, indexado pelo CNPJ.
     """
-    cnpjs = [cnpj.strip().zfill(14) for cnpj in cnpjs if cnpj and cnpj.strip()]
-
-    if not cnpjs:
-        logging.error("A lista de CNPJs está vazia após a limpeza.")
-        return {}
-
-    company_details = {}
-
-    try:
-        with connect_to_db() as conn:
-            with conn.cursor() as cursor:
-
-                # Divide a lista de CNPJs em lotes
-                for i in range(0, len(cnpjs), batch_size):
-                    batch = cnpjs[i:i + batch_size]
+    source = PROFILE_VIVO_VGI_KEYWORDS.source._replace(batch_size=batch_size, max_workers=max_workers, mode=mode)
+    return classification.fetch_company_details(cnpjs, source, use_cache=use_cache, db_pool=db_pool)
 
-                    # Executa a consulta SQL para cada lote
-                    query = """
-                        SELECT cnpj_completo, natureza_juridica
-                        FROM company_details
-                        WHERE cnpj_completo IN %s;
-                    """
-                    cursor.execute(query, (tuple(batch),))
-                    rows = cursor.fetchall()
 
-                    # Mapeia os resultados para um dicionário
-                    for row in rows:
-                        company_details[row[0]] = {
-                            'natureza_juridica': row[1]
-                        }
-
-    except Exception as e:
-        logging.error(f"Error fetching company details: {e}")
-        return {}
-
-    return company_details
-
-
-def add_company_details(df):
+def add_company_details(df, snapshot=None):
     """
-    Adiciona detalhes da empresa ao DataFrame com base nos CNPJs e classifica as empresas.
+    Adiciona detalhes da empresa ao DataFrame e classifica as empresas com o perfil da Vivo VGI com palavras-chave.
 
     Args:
     - df (pd.DataFrame): O DataFrame contendo os dados a serem atualizados.
-    - gov_naturezas (set): Conjunto de códigos de natureza jurídica que correspondem ao governo.
-    - gov_exceptions_cnpjs (set): Conjunto de CNPJs que são exceções e devem ser classificados como governo.
+    - snapshot (CompanySnapshot, opcional): Snapshot local de company_details; se informado, os
+      detalhes são resolvidos nele em vez de consultar o banco.
 
     Returns:
     - pd.DataFrame: O DataFrame atualizado com detalhes da empresa adicionados e classificações.
     """
-    # Limpa e ajusta os CNPJs (CUST_ID_TEXT)
-    df['NR_DOCUMENTO'] = df['NR_DOCUMENTO'].apply(lambda x: str(x).strip().zfill(14) if pd.notnull(x) else '')
-    df['NM_CLIENTE'] = df['NM_CLIENTE'].apply(lambda x: str(x).strip().upper() if pd.notnull(x) else '')
-
-    # Filtra empresas com CNPJ válido
-    df_com_cnpj = df[df['NR_DOCUMENTO'] != '']
-    cnpjs = df_com_cnpj['NR_DOCUMENTO'].unique().tolist()
+    return classification.add_company_details(df, PROFILE_VIVO_VGI_KEYWORDS, snapshot=snapshot)
 
-    # Busca detalhes das empresas
-    company_details = fetch_company_details(cnpjs)
 
-    # Atualiza o DataFrame com os detalhes da empresa
-    df['natureza_juridica'] = df['NR_DOCUMENTO'].map(lambda cnpj: company_details.get(cnpj, {}).get('natureza_juridica', None))
-
-    # Inicializa 'tipo_empresa' como 'PRIVADO'
-    df['tipo_empresa'] = 'PRIVADO'
-
-    # Classifica como 'GOVERNO' com base na natureza jurídica
-    mask_natureza = df['natureza_juridica'].apply(lambda x: pd.notnull(x) and str(x).isdigit() and int(x) in gov_naturezas)
-    df.loc[mask_natureza, 'tipo_empresa'] = 'GOVERNO'
-
-    # Classifica como 'GOVERNO' se o CNPJ estiver em gov_exceptions_cnpjs
-    mask_cnpj = df['NR_DOCUMENTO'].isin(gov_exceptions_cnpjs)
-    df.loc[mask_cnpj, 'tipo_empresa'] = 'GOVERNO'
-
-    # Classifica como 'GOVERNO' se a razão social pertencer ao grupo 5S
-    mask_group_5s = df['NM_CLIENTE'].apply(lambda x: any(name in x for name in keywords_gov))
-    df.loc[mask_group_5s, 'tipo_empresa'] = 'GOVERNO'
-
-    return df
-
-
-def process_csv(input_csv, output_csv):
+def process_csv(input_csv, output_csv, chunksize=None, snapshot_path=COMPANY_SNAPSHOT_PATH):
     """
     Processa o arquivo CSV de entrada, classifica as empresas e salva o resultado em um novo arquivo CSV.
 
     Args:
     - input_csv (str): Caminho para o arquivo CSV de entrada.
     - output_csv (str): Caminho para salvar o arquivo CSV de saída.
+    - chunksize (int, opcional): Quantidade de linhas por bloco no modo streaming.
+    - snapshot_path (str, opcional): Diretório de um snapshot de company_details para classificar sem
+      acesso ao banco.
     """
-    # Lê o arquivo CSV
-    df = pd.read_csv(input_csv)
-
-    # Adiciona os detalhes e classificações
-    df = add_company_details(df)
-
-    # Salva o DataFrame resultante em um novo CSV
-    df.to_csv(output_csv, index=False)
-    print(f"Arquivo salvo com sucesso em: {output_csv}")
+    profile = PROFILE_VIVO_VGI_KEYWORDS._replace(source=PROFILE_VIVO_VGI_KEYWORDS.source._replace(snapshot_path=snapshot_path))
+    classification.process_csv(input_csv, output_csv, profile, chunksize=chunksize)
 
 
 # Exemplo de chamada da função
 if __name__ == "__main__":
     input_csv = '/home/victor-sims/Desktop/Compare_CSV/data/vivo-GVI/202412_Geral_Repasse_VGI.csv'
     output_csv = '/home/victor-sims/Desktop/Compare_CSV/data/vivo-GVI/202412_Geral_Repasse_VGI_Classificado_new.csv'
-    process_csv(input_csv, output_csv)
+    process_csv(input_csv, output_csv, chunksize=500_000)
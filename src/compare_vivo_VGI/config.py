@@ -1,3 +1,4 @@
+from src.common.classification import LookupSource, OperatorProfile
 
 
 gov_naturezas = {1015, 1023, 1244, 1031, 1040, 1058, 1066, 1074, 1082, 1104, 1112, 1120, 1139, 1147, 1155,
@@ -12,10 +13,10 @@ gov_exceptions_cnpjs = {
     '06067608000110'
 }
 
-# keywords_gov = ['PREFEITURA', 'GOVERNO', 'CAMARA', 'MUNICIPIO', 'ESTADO', 'SECRETARIA', 'MINISTERIO', 'TRIBUNAL',
-#                 'OUVIDORIA', 'MARINHA', 'EXERCITO', 'AERONAUTICA', 'BANCO CENTRAL', 'RECEITA FEDERAL', 'INSS',
-#                 'IBAMA', 'ANVISA', 'DETRAN', 'CORREIOS', 'IBGE', 'AUTARQUIA', 'SENAI', 'SENAC', 'SESC', 'SESI',
-#                 'SENAR', 'SESCOOP', 'SEST', 'SENAT', 'SEBRAE']
+keywords_gov = ['PREFEITURA', 'GOVERNO', 'CAMARA', 'MUNICIPIO', 'ESTADO', 'SECRETARIA', 'MINISTERIO', 'TRIBUNAL',
+                'OUVIDORIA', 'MARINHA', 'EXERCITO', 'AERONAUTICA', 'BANCO CENTRAL', 'RECEITA FEDERAL', 'INSS',
+                'IBAMA', 'ANVISA', 'DETRAN', 'CORREIOS', 'IBGE', 'AUTARQUIA', 'SENAI', 'SENAC', 'SESC', 'SESI',
+                'SENAR', 'SESCOOP', 'SEST', 'SENAT', 'SEBRAE']
 
 
 SQL_QUERY_GET_COMPANY_DETAILS = """
@@ -24,3 +25,63 @@ SQL_QUERY_GET_COMPANY_DETAILS = """
     WHERE cnpj_completo = ANY(%s)
     """
 
+SQL_QUERY_GET_NATUREZA_JURIDICA = """
+    SELECT cnpj_completo, natureza_juridica
+    FROM company_details
+    WHERE cnpj_completo = ANY(%s)
+    """
+
+
+# Cache local de CNPJ -> natureza_juridica, compartilhado entre TIM e Vivo (None desativa o cache)
+CNPJ_CACHE_PATH = '/home/victor-sims/Desktop/Compare_CSV/data/cache/cnpj_cache.sqlite3'
+
+# Validade das entradas do cache, em dias (None = nunca expiram)
+CNPJ_CACHE_TTL_DAYS = 30
+
+# Consultas ao banco: CNPJs por lote e quantidade de lotes consultados em paralelo (conexões do pool)
+DB_BATCH_SIZE = 1000
+DB_MAX_WORKERS = 4
+
+# Modo de consulta: 'bulk' envia todos os CNPJs em uma única consulta (ANY(array)) e lê o resultado
+# em streaming com cursor do lado do servidor; 'batch' usa lotes 'IN' em paralelo
+DB_LOOKUP_MODE = 'bulk'
+
+# Linhas trazidas do servidor a cada ida ao banco no modo 'bulk'
+DB_ITERSIZE = 10000
+
+# Snapshot local de company_details (gerado por src/common/company_snapshot.py). Quando definido,
+# a classificação consulta o snapshot em vez do banco
+COMPANY_SNAPSHOT_PATH = None
+
+
+# Perfis do motor de classificação (src/common/classification.py): colunas do arquivo, regras e origem dos
+# detalhes das empresas. Uma nova operadora só precisa de um perfil como estes
+_SOURCE = LookupSource(
+    query=SQL_QUERY_GET_NATUREZA_JURIDICA,
+    mode=DB_LOOKUP_MODE,
+    batch_size=DB_BATCH_SIZE,
+    max_workers=DB_MAX_WORKERS,
+    itersize=DB_ITERSIZE,
+    cache_path=CNPJ_CACHE_PATH,
+    cache_ttl_days=CNPJ_CACHE_TTL_DAYS,
+    snapshot_path=COMPANY_SNAPSHOT_PATH,
+)
+
+PROFILE_VIVO_VGI = OperatorProfile(
+    name='VIVO_VGI',
+    cnpj_column='NR_DOCUMENTO',
+    source=_SOURCE,
+    gov_naturezas=frozenset(gov_naturezas),
+    gov_exceptions_cnpjs=frozenset(gov_exceptions_cnpjs),
+)
+
+# Mesmo perfil com a regra de palavras-chave na razão social (compare_vivo_new.py)
+PROFILE_VIVO_VGI_KEYWORDS = OperatorProfile(
+    name='VIVO_VGI',
+    cnpj_column='NR_DOCUMENTO',
+    source=_SOURCE,
+    gov_naturezas=frozenset(gov_naturezas),
+    gov_exceptions_cnpjs=frozenset(gov_exceptions_cnpjs),
+    name_column='NM_CLIENTE',
+    keywords_gov=tuple(keywords_gov),
+)
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from src.tim_compare_cnpj.schema import to_text
+
+
+"""
+ESTADO PERSISTENTE DOS CNPJs POR MÊS (SQLite)
+
+Cada execução mensal grava os CNPJs do mês com a quantidade de MSISDNs distintos, então a
+comparação do mês seguinte consulta o estado em vez de reler o licencas_unificadas anterior.
+"""
+
+
+class CnpjState:
+    """
+    Tabela cnpj_mes(cnpj, mes, msisdn_count) em SQLite.
+
+    - cnpj: CNPJ como aparece no arquivo unificado, sem espaços nas pontas
+    - mes: rótulo 'AAAA-MM' (a ordem alfabética é a ordem cronológica)
+    - msisdn_count: MSISDNs distintos do CNPJ naquele mês
+    """
+
+    def __init__(self, path: str):
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cnpj_mes (
+                cnpj TEXT NOT NULL,
+                mes TEXT NOT NULL,
+                msisdn_count INTEGER NOT NULL,
+                PRIMARY KEY (mes, cnpj)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cnpj_mes_cnpj ON cnpj_mes (cnpj, mes)")
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def months(self):
+        return [mes for (mes,) in self._conn.execute("SELECT DISTINCT mes FROM cnpj_mes ORDER BY mes")]
+
+    def has_month(self, mes: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM cnpj_mes WHERE mes = ? LIMIT 1", (mes,)).fetchone() is not None
+
+    def iter_cnpjs(self, mes: str, chunksize: int = 1_000_000):
+        """
+        CNPJs registrados no mês, em blocos (pd.Series) de até chunksize itens.
+        """
+        cursor = self._conn.execute("SELECT cnpj FROM cnpj_mes WHERE mes = ?", (mes,))
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.Series([cnpj for (cnpj,) in rows], dtype=str)
+
+    def cnpjs(self, mes: str) -> pd.Series:
+        chunks = list(self.iter_cnpjs(mes))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.Series([], dtype=str)
+
+    def first_seen(self, cnpjs) -> dict:
+        """
+        Primeiro mês em que cada CNPJ aparece no estado (CNPJs nunca vistos ficam de fora).
+        """
+        cnpjs = list(cnpjs)
+        first = {}
+        # Limite de parâmetros por consulta (o SQLite antigo aceita no máximo 999 variáveis)
+        for i in range(0, len(cnpjs), 900):
+            batch = cnpjs[i:i + 900]
+            placeholders = ",".join("?" * len(batch))
+            first.update(self._conn.execute(
+                f"SELECT cnpj, MIN(mes) FROM cnpj_mes WHERE cnpj IN ({placeholders}) GROUP BY cnpj", batch
+            ))
+        return first
+
+    def begin_month(self, mes: str):
+        """
+        Apaga o que houver do mês, abrindo uma transação. Feche com add_counts(...) e commit().
+        Enquanto não houver commit, uma falha no meio não deixa o mês gravado pela metade.
+        """
+        self._conn.execute("DELETE FROM cnpj_mes WHERE mes = ?", (mes,))
+
+    def add_counts(self, mes: str, counts: pd.Series):
+        """
+        Acrescenta contagens ao mês. counts: Series indexada pelo CNPJ com a quantidade de MSISDNs.
+        """
+        self._conn.executemany(
+            "INSERT INTO cnpj_mes (cnpj, mes, msisdn_count) VALUES (?, ?, ?) "
+            "ON CONFLICT (mes, cnpj) DO UPDATE SET msisdn_count = msisdn_count + excluded.msisdn_count",
+            ((cnpj, mes, int(n)) for cnpj, n in counts.items())
+        )
+
+    def commit(self):
+        self._conn.commit()
+
+    def record_month(self, mes: str, counts: pd.Series):
+        """
+        Substitui o mês inteiro pelas contagens informadas (reexecutar o mesmo mês é seguro).
+        """
+        self.begin_month(mes)
+        self.add_counts(mes, counts)
+        self.commit()
+
+
+def msisdn_counts(df: pd.DataFrame) -> pd.Series:
+    """
+    MSISDNs distintos por CNPJ (CNPJ sem espaços nas pontas, como na comparação).
+    Aceita o esquema compacto: o CNPJ uint64 só vira texto depois de agrupado.
+    """
+    cnpj = df["CNPJ"]
+    if cnpj.dtype != np.uint64:
+        cnpj = cnpj.astype(str).str.strip()
+    counts = df.groupby(cnpj)["MSISDN"].nunique()
+    counts.index = to_text(counts.index.to_series(), "CNPJ")
+    return counts
@@ -1,34 +1,58 @@
+import os
+import tempfile
+import numpy as np
 import pandas as pd
 from datetime import date
 from pathlib import Path
+from src.tim_compare_cnpj.cnpj_state import CnpjState, msisdn_counts
+from src.tim_compare_cnpj.io_utils import read_table
+from src.tim_compare_cnpj.schema import cnpj_keys, compact, restore
+from src.tim_compare_cnpj.unify_csv import guess_date_format
 
 
 # -------------------------------
+# Aceita .csv ou a saída .parquet/.feather do unify_csv
 NEW_CSV = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/licencas_unificadas_dezembro.csv"
 OLD_CSV = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/licencas_unificadas_novembro.csv"
 
 OUT_EMPRESA_EXISTENTE = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/empresa_existente.csv"
 OUT_EMPRESA_NOVA = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/empresa_nova.csv"
 OUT_FATURAMENTO_PADRAO = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/faturamento_padrao.csv"
+
+# Estado persistente dos CNPJs por mês (None = sempre relê OLD_CSV).
+# Os meses vêm do período filtrado em main(): NEW_CSV é gravado como o mês filtrado (ex.: "2025-12")
+# e OLD_CSV como o mês antes dele (ex.: "2025-11"). Com estado, OLD_CSV só é lido na primeira vez,
+# se esse mês ainda não estiver registrado; o mês novo vira o "mês anterior" da próxima execução.
+CNPJ_STATE_PATH = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/cnpj_state.sqlite3"
+
+# Modo fora da memória: com OUT_OF_CORE_BUCKETS > 0 os arquivos são particionados em disco pelo
+# CNPJ e comparados bucket a bucket (a ordem das linhas nas saídas muda). 0 = tudo em memória.
+OUT_OF_CORE_BUCKETS = 0
+OUT_OF_CORE_CHUNKSIZE = 1_000_000
+OUT_OF_CORE_TMP_DIR = None
 # -------------------------------
 
 COLS = ["MSISDN", "CNPJ", "RAZAO SOCIAL", "DATA_STATUS_SERVICO", "STATUS_SERVICO"]
+KEY_COLS = ["MSISDN", "CNPJ", "DATA_STATUS_SERVICO", "STATUS_SERVICO", "RAZAO SOCIAL"]
 
-def read_csv_flex(path: str) -> pd.DataFrame:
-    return pd.read_csv(
-        path,
-        sep=None,
-        engine="python",
-        dtype=str,
-        keep_default_na=False,
-        encoding="utf-8"
-    )
-
-def normalize_date(s: pd.Series) -> pd.Series:
+def normalize_date(s: pd.Series, date_format=None) -> pd.Series:
     s = s.astype(str).str.strip().replace({"": None, "nan": None, "None": None})
-    d = pd.to_datetime(s, errors="coerce", dayfirst=False)
+    d = pd.to_datetime(s, errors="coerce", dayfirst=False, format=date_format)
     return d.dt.strftime("%Y-%m-%d")
 
+
+def date_format_of(chunks):
+    """
+    Formato das datas do arquivo novo, inferido uma vez (do primeiro valor não vazio, como o
+    pd.to_datetime faria com a coluna inteira) e usado em todos os blocos/buckets, para que os dois
+    modos leiam as datas do mesmo jeito. Sem formato reconhecível, usa "mixed" (valor a valor).
+    """
+    for dates in chunks:
+        date_format, found = guess_date_format(dates)
+        if found:
+            return date_format or "mixed"
+    return None
+
 def previous_month_range(ref: date):
     """
     Retorna (inicio_mes_anterior, inicio_mes_atual) como Timestamps.
@@ -47,59 +71,240 @@ def previous_month_range(ref: date):
     return pd.Timestamp(first_prev_month), pd.Timestamp(first_this_month)
 
 
-def main():
-    df_new = read_csv_flex(NEW_CSV)
-    df_old = read_csv_flex(OLD_CSV)
+def month_keys(start_prev):
+    """
+    Retorna (new_month, old_month) no formato "AAAA-MM" para o estado.
+    Ex: se start_prev = 2025-12-01 -> ("2025-12", "2025-11")
+    """
+    old_start = start_prev - pd.offsets.MonthBegin(1)
+    return start_prev.strftime("%Y-%m"), old_start.strftime("%Y-%m")
 
-    # valida colunas
-    for name, df in [("new", df_new), ("old", df_old)]:
-        missing = [c for c in COLS if c not in df.columns]
-        if missing:
-            raise ValueError(f"CSV {name} está sem as colunas: {missing}")
 
-    # normaliza data
-    df_new["DATA_STATUS_SERVICO"] = normalize_date(df_new["DATA_STATUS_SERVICO"])
-    df_old["DATA_STATUS_SERVICO"] = normalize_date(df_old["DATA_STATUS_SERVICO"])
+def hash_rows(df: pd.DataFrame, cols) -> np.ndarray:
+    """
+    Hash de 64 bits de cada linha, considerando apenas as colunas informadas.
+    Vetorizado (pd.util.hash_pandas_object), sem montar uma string por linha.
+    """
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
 
-    start_prev, start_this = previous_month_range(date.today())     # filtra new para mês anterior ao atual
-    # start_prev, start_this = previous_month_range(date(2026, 1, 15))
 
-    dt_new = pd.to_datetime(df_new["DATA_STATUS_SERVICO"], errors="coerce")
+def classify_month(df_new: pd.DataFrame, old_cnpj_keys: np.ndarray, start_prev, start_this):
+    """
+    Classifica as linhas de df_new sem copiar o DataFrame.
 
-    df_new_prev_month = df_new.loc[(dt_new >= start_prev) & (dt_new < start_this)].copy()
+    Retorna três máscaras booleanas (numpy) alinhadas com df_new:
+    - empresa_existente: linhas do mês anterior cujo CNPJ já existia no arquivo antigo
+    - empresa_nova: linhas do mês anterior com CNPJ que não existia no arquivo antigo
+    - faturamento_padrao: linhas cuja chave (KEY_COLS) não aparece em nenhuma linha de empresa_nova
 
-    old_cnpjs = set(df_old["CNPJ"].astype(str).str.strip())
+    As comparações são anti-joins sobre chaves de 64 bits (np.isin), não sobre strings.
+    """
+    dt_new = pd.to_datetime(df_new["DATA_STATUS_SERVICO"], format="%Y-%m-%d", errors="coerce")
+    prev_month = ((dt_new >= start_prev) & (dt_new < start_this)).to_numpy()
 
     # separa existente/nova com base no CNPJ
-    df_empresa_existente = df_new_prev_month[df_new_prev_month["CNPJ"].astype(str).str.strip().isin(old_cnpjs)].copy()
-    df_empresa_nova = df_new_prev_month[~df_new_prev_month["CNPJ"].astype(str).str.strip().isin(old_cnpjs)].copy()
+    in_old = np.isin(cnpj_keys(df_new["CNPJ"]), old_cnpj_keys)
+    existente = prev_month & in_old
+    nova = prev_month & ~in_old
 
-    # faturamento_padrao:
-    key_cols = ["MSISDN", "CNPJ", "DATA_STATUS_SERVICO", "STATUS_SERVICO", "RAZAO SOCIAL"]
+    # faturamento_padrao: tudo do new, menos as linhas iguais a alguma empresa_nova
+    row_hashes = hash_rows(df_new, KEY_COLS)
+    faturamento = ~np.isin(row_hashes, row_hashes[nova])
 
-    df_new_keyed = df_new.copy()
-    df_empresa_nova_keyed = df_empresa_nova.copy()
+    return existente, nova, faturamento
 
-    df_new_keyed["_k"] = df_new_keyed[key_cols].astype(str).agg("|".join, axis=1)
-    df_empresa_nova_keyed["_k"] = df_empresa_nova_keyed[key_cols].astype(str).agg("|".join, axis=1)
 
-    novas_keys = set(df_empresa_nova_keyed["_k"])
+def check_columns(name: str, df: pd.DataFrame, cols):
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise ValueError(f"CSV {name} está sem as colunas: {missing}")
 
-    df_faturamento_padrao = df_new_keyed[~df_new_keyed["_k"].isin(novas_keys)].drop(columns=["_k"])
+
+def load_old_cnpjs(old_month: str, state=None) -> np.ndarray:
+    """
+    Hashes (únicos) dos CNPJs do mês anterior.
+    Com estado, vêm do SQLite; OLD_CSV só é lido se old_month ainda não estiver registrado
+    (e nesse caso ele é gravado no estado para as próximas execuções).
+    """
+    if state is not None and state.has_month(old_month):
+        return np.unique(cnpj_keys(state.cnpjs(old_month)))
+
+    # do arquivo antigo só interessa o CNPJ (e o MSISDN, para as contagens do estado)
+    cols = ["CNPJ"] if state is None else ["CNPJ", "MSISDN"]
+    df_old = read_table(OLD_CSV, usecols=cols)
+    check_columns("old", df_old, cols)
+
+    if state is not None:
+        state.record_month(old_month, msisdn_counts(df_old))
+    return np.unique(cnpj_keys(df_old["CNPJ"]))
+
+
+def compare_in_memory(start_prev, start_this, new_month: str, old_month: str, state=None):
+    """
+    Compara NEW_CSV com o mês anterior carregando o arquivo novo em memória.
+    new_month/old_month são as chaves "AAAA-MM" de NEW_CSV e OLD_CSV no estado.
+    Retorna as quantidades de linhas (empresa_existente, empresa_nova, faturamento_padrao).
+    """
+    df_new = read_table(NEW_CSV, usecols=COLS)
+
+    # valida colunas
+    check_columns("new", df_new, COLS)
+
+    # normaliza data
+    date_format = date_format_of([df_new["DATA_STATUS_SERVICO"]])
+    df_new["DATA_STATUS_SERVICO"] = normalize_date(df_new["DATA_STATUS_SERVICO"], date_format)
+    compact(df_new)
+
+    old_cnpjs = load_old_cnpjs(old_month, state)
+
+    masks = classify_month(df_new, old_cnpjs, start_prev, start_this)
 
     # garante ordem de colunas
-    df_empresa_existente = df_empresa_existente[COLS]
-    df_empresa_nova = df_empresa_nova[COLS]
-    df_faturamento_padrao = df_faturamento_padrao[COLS]
-
-    df_empresa_existente.to_csv(OUT_EMPRESA_EXISTENTE, index=False, encoding="utf-8")
-    df_empresa_nova.to_csv(OUT_EMPRESA_NOVA, index=False, encoding="utf-8")
-    df_faturamento_padrao.to_csv(OUT_FATURAMENTO_PADRAO, index=False, encoding="utf-8")
-
-    print(f"OK! Linhas mês anterior (new filtrado): {len(df_new_prev_month)}")
-    print(f" - empresa_existente: {len(df_empresa_existente)} -> {Path(OUT_EMPRESA_EXISTENTE).resolve()}")
-    print(f" - empresa_nova: {len(df_empresa_nova)} -> {Path(OUT_EMPRESA_NOVA).resolve()}")
-    print(f" - faturamento_padrao: {len(df_faturamento_padrao)} -> {Path(OUT_FATURAMENTO_PADRAO).resolve()}")
+    outputs = [OUT_EMPRESA_EXISTENTE, OUT_EMPRESA_NOVA, OUT_FATURAMENTO_PADRAO]
+    for out, mask in zip(outputs, masks):
+        restore(df_new.loc[mask, COLS]).to_csv(out, index=False, encoding="utf-8")
+
+    if state is not None:
+        state.record_month(new_month, msisdn_counts(df_new))
+
+    return tuple(int(mask.sum()) for mask in masks)
+
+
+def bucket_slices(bucket_ids: np.ndarray, n_buckets: int):
+    """
+    Para cada bucket presente, retorna (bucket, posições das linhas), preservando a ordem original.
+    """
+    order = np.argsort(bucket_ids, kind="stable")
+    bounds = np.searchsorted(bucket_ids[order], np.arange(n_buckets + 1))
+    for b in range(n_buckets):
+        if bounds[b] < bounds[b + 1]:
+            yield b, order[bounds[b]:bounds[b + 1]]
+
+
+def read_checked_chunks(path: str, name: str, cols, chunksize: int):
+    for chunk in read_table(path, usecols=cols, chunksize=chunksize):
+        check_columns(name, chunk, cols)
+        yield chunk
+
+
+def partition_csv(path: str, name: str, cols, tmp_dir: str, n_buckets: int, chunksize: int):
+    """
+    Particiona o CSV em n_buckets arquivos (sem cabeçalho) pelo hash do CNPJ, lendo em blocos.
+    Linhas com o mesmo CNPJ (e portanto com a mesma chave) sempre caem no mesmo bucket.
+    """
+    paths = [os.path.join(tmp_dir, f"{name}_{b:04d}.csv") for b in range(n_buckets)]
+    for chunk in read_checked_chunks(path, name, cols, chunksize):
+        bucket_ids = cnpj_keys(chunk["CNPJ"]) % n_buckets
+        for b, rows in bucket_slices(bucket_ids, n_buckets):
+            chunk.iloc[rows][cols].to_csv(paths[b], mode="a", header=False, index=False, encoding="utf-8")
+    return paths
+
+
+def partition_keys(cnpj_chunks, tmp_dir: str, n_buckets: int):
+    """
+    Particiona as chaves dos CNPJs (blocos de pd.Series) em n_buckets arquivos binários (uint64).
+    """
+    paths = [os.path.join(tmp_dir, f"old_{b:04d}.u64") for b in range(n_buckets)]
+    for cnpjs in cnpj_chunks:
+        keys = cnpj_keys(cnpjs)
+        for b, rows in bucket_slices(keys % n_buckets, n_buckets):
+            with open(paths[b], "ab") as f:
+                np.unique(keys[rows]).tofile(f)
+    return paths
+
+
+def read_bucket(path: str, cols) -> pd.DataFrame:
+    return pd.read_csv(path, names=cols, header=None, dtype=str, keep_default_na=False)
+
+
+def compare_out_of_core(start_prev, start_this, new_month: str, old_month: str, n_buckets: int, chunksize: int,
+                        tmp_dir=None, state=None):
+    """
+    Mesma comparação de compare_in_memory, para arquivos maiores que a memória.
+
+    Os dois arquivos são particionados em disco pelo hash do CNPJ e cada bucket é classificado
+    separadamente, então a memória fica limitada ao tamanho de um bucket (mais um bloco de leitura).
+    O resultado tem as mesmas linhas do modo em memória, mas agrupadas por bucket: a ordem das
+    linhas nos arquivos de saída é diferente da ordem do arquivo novo.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        new_parts = partition_csv(NEW_CSV, "new", COLS, tmp, n_buckets, chunksize)
+        date_format = date_format_of(
+            chunk["DATA_STATUS_SERVICO"]
+            for chunk in read_checked_chunks(NEW_CSV, "new", ["DATA_STATUS_SERVICO"], chunksize)
+        )
+
+        if state is not None and not state.has_month(old_month):
+            # primeira execução com estado: registra o mês anterior a partir de OLD_CSV
+            state.begin_month(old_month)
+            for part in partition_csv(OLD_CSV, "old", ["CNPJ", "MSISDN"], tmp, n_buckets, chunksize):
+                if os.path.exists(part):
+                    state.add_counts(old_month, msisdn_counts(read_bucket(part, ["CNPJ", "MSISDN"])))
+            state.commit()
+
+        if state is not None:
+            old_chunks = state.iter_cnpjs(old_month, chunksize)
+        else:
+            old_chunks = (chunk["CNPJ"] for chunk in read_checked_chunks(OLD_CSV, "old", ["CNPJ"], chunksize))
+        old_parts = partition_keys(old_chunks, tmp, n_buckets)
+
+        outputs = [OUT_EMPRESA_EXISTENTE, OUT_EMPRESA_NOVA, OUT_FATURAMENTO_PADRAO]
+        for out in outputs:
+            pd.DataFrame(columns=COLS).to_csv(out, index=False, encoding="utf-8")
+
+        if state is not None:
+            state.begin_month(new_month)
+
+        totals = [0, 0, 0]
+        for new_part, old_part in zip(new_parts, old_parts):
+            if not os.path.exists(new_part):
+                continue
+
+            df_new = read_bucket(new_part, COLS)
+            if os.path.exists(old_part):
+                old_cnpjs = np.unique(np.fromfile(old_part, dtype=np.uint64))
+            else:
+                old_cnpjs = np.empty(0, dtype=np.uint64)
+
+            df_new["DATA_STATUS_SERVICO"] = normalize_date(df_new["DATA_STATUS_SERVICO"], date_format)
+            compact(df_new)
+            masks = classify_month(df_new, old_cnpjs, start_prev, start_this)
+
+            for i, (out, mask) in enumerate(zip(outputs, masks)):
+                restore(df_new.loc[mask, COLS]).to_csv(out, mode="a", header=False, index=False, encoding="utf-8")
+                totals[i] += int(mask.sum())
+
+            # buckets têm CNPJs disjuntos, então as contagens de cada um são definitivas
+            if state is not None:
+                state.add_counts(new_month, msisdn_counts(df_new))
+
+        if state is not None:
+            state.commit()
+
+    return tuple(totals)
+
+
+def main():
+    start_prev, start_this = previous_month_range(date.today())     # filtra new para mês anterior ao atual
+    # start_prev, start_this = previous_month_range(date(2026, 1, 15))
+    new_month, old_month = month_keys(start_prev)
+
+    state = CnpjState(CNPJ_STATE_PATH) if CNPJ_STATE_PATH else None
+    try:
+        if OUT_OF_CORE_BUCKETS:
+            existente, nova, faturamento = compare_out_of_core(
+                start_prev, start_this, new_month, old_month, OUT_OF_CORE_BUCKETS, OUT_OF_CORE_CHUNKSIZE, OUT_OF_CORE_TMP_DIR, state
+            )
+        else:
+            existente, nova, faturamento = compare_in_memory(start_prev, start_this, new_month, old_month, state)
+    finally:
+        if state is not None:
+            state.close()
+
+    print(f"OK! Linhas mês anterior (new filtrado): {existente + nova}")
+    print(f" - empresa_existente: {existente} -> {Path(OUT_EMPRESA_EXISTENTE).resolve()}")
+    print(f" - empresa_nova: {nova} -> {Path(OUT_EMPRESA_NOVA).resolve()}")
+    print(f" - faturamento_padrao: {faturamento} -> {Path(OUT_FATURAMENTO_PADRAO).resolve()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+"""
+REMOÇÃO DE DUPLICATAS EXATAS EM STREAMING
+
+Cada linha vira um fingerprint de 64 bits (pd.util.hash_pandas_object sobre todas as colunas),
+então a memória gasta é de 8 bytes por linha distinta, independente do tamanho das linhas.
+Em ambos os modos vale a primeira ocorrência, como no drop_duplicates().
+"""
+
+# Memória por linha distinta no modo em memória: o array ordenado mais a cópia feita a cada inserção
+BYTES_PER_FINGERPRINT = 16
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class FingerprintSet:
+    """
+    Conjunto de fingerprints já vistos, guardado como um array uint64 ordenado.
+    """
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.seen)
+
+    def first_seen(self, fingerprints: np.ndarray) -> np.ndarray:
+        """
+        Máscara das linhas cujo fingerprint aparece pela primeira vez (no bloco e no histórico),
+        registrando os novos fingerprints.
+        """
+        mask = ~pd.Series(fingerprints).duplicated().to_numpy()
+        if len(self.seen):
+            pos = np.minimum(np.searchsorted(self.seen, fingerprints), len(self.seen) - 1)
+            mask &= self.seen[pos] != fingerprints
+
+        novos = np.sort(fingerprints[mask])
+        self.seen = np.insert(self.seen, np.searchsorted(self.seen, novos), novos)
+        return mask
+
+
+def dedupe_in_memory(chunks):
+    """
+    Remove duplicatas de um fluxo de blocos mantendo só os fingerprints em memória.
+    A ordem das linhas é a mesma do drop_duplicates() sobre a concatenação dos blocos.
+    """
+    vistos = FingerprintSet()
+    for chunk in chunks:
+        yield chunk[vistos.first_seen(row_fingerprints(chunk))]
+
+
+def dedupe_on_disk(chunks, cols, n_buckets: int, tmp_dir=None):
+    """
+    Mesmo resultado de dedupe_in_memory para quando nem os fingerprints cabem na memória.
+
+    As linhas são particionadas em disco pelo fingerprint (duplicatas caem sempre no mesmo
+    bucket) e cada bucket é deduplicado separadamente. A saída tem as mesmas linhas, mas
+    agrupadas por bucket: a ordem difere da ordem de entrada.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        paths = [os.path.join(tmp, f"dedupe_{b:04d}.csv") for b in range(n_buckets)]
+
+        for chunk in chunks:
+            fingerprints = row_fingerprints(chunk)
+            bucket_ids = fingerprints % n_buckets
+            order = np.argsort(bucket_ids, kind="stable")
+            bounds = np.searchsorted(bucket_ids[order], np.arange(n_buckets + 1))
+            for b in range(n_buckets):
+                if bounds[b] < bounds[b + 1]:
+                    rows = order[bounds[b]:bounds[b + 1]]
+                    chunk.iloc[rows][cols].to_csv(paths[b], mode="a", header=False, index=False, encoding="utf-8")
+
+        for path in paths:
+            if os.path.exists(path):
+                bucket = pd.read_csv(path, names=cols, header=None, dtype=str, keep_default_na=False)
+                yield bucket[~pd.Series(row_fingerprints(bucket)).duplicated().to_numpy()]
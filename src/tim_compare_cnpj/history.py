@@ -0,0 +1,91 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+"""
+PARSER VETORIZADO DO HISTORICO_SERVICO (pyarrow.compute, sem regex e sem laço em Python)
+
+Formato: eventos separados por '|', cada um 'AAMMDD' + letra do status.
+Ex: '190828a|200318s|210101d' -> ativação em 2019-08-28, último evento 'd' em 2021-01-01.
+"""
+
+SEPARADOR_EVENTOS = "|"
+
+
+def _parse_events(hist: pd.Series):
+    """
+    Quebra o histórico em eventos.
+    Retorna (índice da entrada de cada evento, datas YYYY-MM-DD, letras, máscara de eventos vazios).
+    Todo histórico gera ao menos um evento (um histórico vazio gera um evento vazio, com data nula).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = pa.array(hist, type=pa.string(), from_pandas=True)
+    arr = pc.utf8_trim_whitespace(pc.fill_null(arr, ""))
+
+    events = pc.split_pattern(arr, SEPARADOR_EVENTOS)
+    parents = pc.list_parent_indices(events).to_numpy(zero_copy_only=False)
+    flat = pc.utf8_trim_whitespace(pc.list_flatten(events))
+
+    yymmdd = pc.utf8_slice_codeunits(flat, 0, 6)
+    mm = pc.utf8_slice_codeunits(yymmdd, 2, 4)
+    dd = pc.utf8_slice_codeunits(yymmdd, 4, 6)
+    status = pc.utf8_slice_codeunits(flat, 6, 7)
+
+    # O strptime do Arrow aceita menos dígitos e "rola" datas inválidas (240230 -> 2024-03-01),
+    # então só valem 6 dígitos cujo mês/dia lidos batem com o texto
+    parsed = pc.strptime(yymmdd, format="%y%m%d", unit="s", error_is_null=True)
+    valid = pc.and_(pc.equal(pc.utf8_length(yymmdd), 6), pc.utf8_is_digit(yymmdd))
+    valid = pc.and_(valid, pc.equal(pc.month(parsed), pc.cast(pc.if_else(valid, mm, "0"), pa.int64())))
+    valid = pc.and_(valid, pc.equal(pc.day(parsed), pc.cast(pc.if_else(valid, dd, "0"), pa.int64())))
+
+    # YYYY-MM-DD montado do ano lido (que resolve o século) e do próprio texto, sem strftime
+    text = pc.binary_join_element_wise(pc.cast(pc.year(parsed), pa.string()), mm, dd, "-")
+    dates = pc.if_else(valid, text, None)
+
+    vazio = pc.equal(pc.utf8_length(flat), 0)
+    return parents, dates, status, vazio
+
+
+def parse_history(hist: pd.Series) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Lê o HISTORICO_SERVICO de uma vez, em formato colunar.
+
+    Retorna:
+    - resumo (uma linha por entrada, mesmo índice de hist):
+        DATA_ATIVACAO         -> data do primeiro evento (YYYY-MM-DD ou NaN)
+        DATA_ULTIMO_EVENTO    -> data do último evento da lista
+        STATUS_ULTIMO_EVENTO  -> letra do último evento (a/s/d...)
+    - eventos (uma linha por evento não vazio):
+        LINHA (posição da entrada em hist), ORDEM (0 = primeiro), DATA_EVENTO, STATUS_EVENTO
+    Datas inválidas ficam NaN, como no pd.to_datetime(errors="coerce").
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    parents, dates, status, vazio = _parse_events(hist)
+
+    # cada entrada tem ao menos um evento, então primeiro/último saem das trocas de índice
+    novo = np.r_[True, parents[1:] != parents[:-1]]
+    first = np.flatnonzero(novo)
+    last = np.r_[first[1:] - 1, len(parents) - 1] if len(parents) else first
+
+    resumo = pa.table({
+        "DATA_ATIVACAO": dates.take(first),
+        "DATA_ULTIMO_EVENTO": dates.take(last),
+        "STATUS_ULTIMO_EVENTO": status.take(last),
+    }).to_pandas()
+    resumo.index = hist.index
+
+    ordem = np.arange(len(parents)) - first[parents] if len(parents) else parents
+    nao_vazio = pc.invert(vazio)
+    eventos = pa.table({
+        "LINHA": pa.array(parents).filter(nao_vazio),
+        "ORDEM": pa.array(ordem).filter(nao_vazio),
+        "DATA_EVENTO": dates.filter(nao_vazio),
+        "STATUS_EVENTO": status.filter(nao_vazio),
+    }).to_pandas()
+    return resumo, eventos
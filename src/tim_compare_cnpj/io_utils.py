@@ -0,0 +1,337 @@
+import csv
+import os
+from typing import Iterable, List, Optional
+
+import pandas as pd
+from src.common.encoding import detectar_codificacao
+from src.tim_compare_cnpj.schema import restore
+
+
+DELIMITADORES = ",;\t|"
+AMOSTRA_BYTES = 16 * 1024
+
+# Formato colunar (Parquet/Feather): colunas gravadas com tipo próprio em vez de texto.
+# CNPJ vira int64 (a largura fica nos metadados do campo para restaurar os zeros à esquerda),
+# datas AAAA-MM-DD viram date32 e o status vira dicionário.
+COLUMNAR_EXTENSIONS = {".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+INT_COLUMNS = {"CNPJ": 14}
+DATE_COLUMNS = {"DATA_STATUS_SERVICO", "DATA_EVENTO"}
+DICTIONARY_COLUMNS = {"STATUS_SERVICO", "STATUS_EVENTO"}
+
+
+def read_sample(path: str, encoding: str, num_bytes: int = AMOSTRA_BYTES) -> str:
+    """
+    Lê os primeiros KB do arquivo, descartando a última linha se ela tiver sido cortada no meio.
+    """
+    with open(path, encoding=encoding, errors="replace", newline="") as f:
+        amostra = f.read(num_bytes)
+
+    if len(amostra) == num_bytes and "\n" in amostra:
+        amostra = amostra[:amostra.rindex("\n")]
+    return amostra
+
+
+def detect_delimiter(amostra: str) -> str:
+    """
+    Detecta o separador (, ; \\t |) pela amostra com csv.Sniffer.
+    Se o Sniffer não decidir, usa o separador que mais aparece no cabeçalho.
+    """
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=DELIMITADORES).delimiter
+    except csv.Error:
+        cabecalho = amostra.split("\n", 1)[0]
+        return max(DELIMITADORES, key=cabecalho.count)
+
+
+def read_header(amostra: str, sep: str) -> List[str]:
+    """Retorna os nomes das colunas da primeira linha da amostra."""
+    return next(csv.reader(amostra.splitlines()[:1], delimiter=sep), [])
+
+
+def read_csv_flex(path: str, usecols: Optional[Iterable[str]] = None, chunksize: Optional[int] = None):
+    """
+    Lê CSV autodetectando separador (, ; \\t |) e codificação.
+    Força colunas como string para evitar problemas com MSISDN/CNPJ.
+
+    Separador e cabeçalho saem só da amostra inicial, então o arquivo inteiro é lido pelo parser C
+    do pandas em vez do parser Python que o sep=None exige. (O engine "pyarrow" do pandas infere
+    números antes de aplicar dtype=str e perde os zeros à esquerda do CNPJ, por isso não é usado.)
+    Com usecols, apenas essas colunas são materializadas; colunas ausentes são ignoradas aqui
+    para que a validação de quem chamou continue apontando quais faltam.
+    Com chunksize, retorna um iterador de DataFrames (como o pd.read_csv).
+    """
+    encoding = detectar_codificacao(path)
+    amostra = read_sample(path, encoding)
+    sep = detect_delimiter(amostra)
+
+    if usecols is not None:
+        desejadas = set(usecols)
+        usecols = [c for c in read_header(amostra, sep) if c in desejadas]
+
+    return pd.read_csv(
+        path,
+        sep=sep,
+        engine="c",
+        dtype=str,
+        keep_default_na=False, # evita virar NaN em campos vazios
+        encoding=encoding,
+        usecols=usecols,
+        chunksize=chunksize,
+    )
+
+
+def estimate_rows(path: str) -> int:
+    """
+    Estimativa da quantidade de linhas pelo tamanho do arquivo e o tamanho médio das linhas da amostra.
+    """
+    amostra = read_sample(path, detectar_codificacao(path))
+    linhas = max(amostra.count("\n"), 1)
+    bytes_por_linha = max(len(amostra.encode("utf-8")) / linhas, 1)
+    return int(os.path.getsize(path) / bytes_por_linha)
+
+
+def columnar_format(path: str) -> Optional[str]:
+    return COLUMNAR_EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+
+
+def to_typed_table(df: pd.DataFrame):
+    """
+    Converte um DataFrame de strings (como o gerado pelo unify_csv) numa tabela Arrow tipada.
+    Se algum valor não couber no tipo (ex.: CNPJ que não tem 14 dígitos), a coluna fica como texto.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    fields, arrays = [], []
+    for name in df.columns:
+        if not pd.api.types.is_string_dtype(df[name]):
+            # colunas numéricas (ex.: ORDEM dos eventos) mantêm o próprio tipo
+            arr = pa.array(df[name], from_pandas=True)
+            fields.append(pa.field(name, arr.type))
+            arrays.append(arr)
+            continue
+
+        arr = pa.array(df[name], type=pa.string(), from_pandas=True)
+        field = pa.field(name, pa.string())
+
+        if name in INT_COLUMNS:
+            width = INT_COLUMNS[name]
+            valid = pc.and_(pc.equal(pc.utf8_length(arr), width), pc.utf8_is_digit(arr))
+            if arr.null_count == 0 and pc.all(valid).as_py() is not False:
+                arr = pc.cast(arr, pa.int64())
+                field = pa.field(name, pa.int64(), metadata={"width": str(width)})
+        elif name in DATE_COLUMNS:
+            vazio = pc.equal(arr, "")
+            arr = pc.cast(
+                pc.strptime(pc.if_else(vazio, None, arr), format="%Y-%m-%d", unit="s", error_is_null=True),
+                pa.date32()
+            )
+            field = pa.field(name, pa.date32())
+        elif name in DICTIONARY_COLUMNS:
+            arr = pc.dictionary_encode(arr)
+            field = pa.field(name, arr.type)
+
+        fields.append(field)
+        arrays.append(arr)
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def restore_strings(table) -> pd.DataFrame:
+    """
+    Volta uma tabela tipada para o formato texto que o CSV teria:
+    inteiros com zeros à esquerda, datas AAAA-MM-DD, dicionários como texto e nulos como "".
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = {}
+    for field, col in zip(table.schema, table.columns):
+        if pa.types.is_integer(field.type):
+            col = pc.cast(col, pa.string())
+            width = (field.metadata or {}).get(b"width")
+            if width:
+                col = pc.utf8_lpad(col, int(width), "0")
+        elif pa.types.is_date(field.type):
+            col = pc.strftime(pc.cast(col, pa.timestamp("s")), format="%Y-%m-%d")
+        elif not pa.types.is_string(field.type):
+            col = pc.cast(col, pa.string())
+        columns[field.name] = pc.fill_null(col, "")
+
+    return pa.table(columns).to_pandas()
+
+
+class TableWriter:
+    """
+    Grava blocos de DataFrame, um após o outro, num único arquivo: Parquet/Feather tipado se a
+    extensão for .parquet/.feather/.arrow, senão CSV.
+    Aceita o esquema compacto (schema.compact): o texto original é restaurado em cada bloco.
+
+    O primeiro bloco define o esquema tipado e os seguintes são convertidos para ele. As colunas
+    dicionário usam um dicionário que só cresce, porque o Feather não aceita trocar o dicionário
+    entre lotes (apenas acrescentar valores).
+    """
+
+    def __init__(self, path: str, columns=None):
+        self.path = path
+        self.fmt = columnar_format(path)
+        self.columns = columns
+        self.rows = 0
+        self._started = False
+        self._writer = None
+        self._schema = None
+        self._dicts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        if len(df) == 0:
+            return
+        df = restore(df)
+        if self.fmt is None:
+            df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started,
+                      index=False, encoding="utf-8")
+        else:
+            self._write_table(to_typed_table(df))
+        self._started = True
+        self.rows += len(df)
+
+    def _unify_dictionaries(self, table):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        for i, field in enumerate(table.schema):
+            if not pa.types.is_dictionary(field.type):
+                continue
+            values = pc.cast(table.column(i), pa.string())
+            known = self._dicts.get(field.name, pa.array([], type=pa.string()))
+            novos = pc.unique(values.filter(pc.invert(pc.is_in(values, value_set=known)))).drop_null()
+            known = pa.concat_arrays([known, novos])
+            indices = pc.cast(pc.index_in(values, value_set=known), field.type.index_type)
+            table = table.set_column(i, field, pa.DictionaryArray.from_arrays(indices.combine_chunks(), known))
+            self._dicts[field.name] = known
+        return table
+
+    def _align_int_columns(self, table):
+        """
+        Colunas inteiras (INT_COLUMNS) não passam pelo cast genérico: ele converteria texto fora da
+        largura em inteiro (perdendo dígitos) e inteiros em texto sem os zeros à esquerda.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        for i, field in enumerate(table.schema):
+            if field.name not in INT_COLUMNS or field.name not in self._schema.names:
+                continue
+            esperado = self._schema.field(field.name)
+            if pa.types.is_integer(esperado.type) and pa.types.is_string(field.type):
+                # o bloco falhou na validação de to_typed_table (ex.: CNPJ com 15 dígitos)
+                raise ValueError(
+                    f"Bloco com {field.name} fora de {INT_COLUMNS[field.name]} dígitos depois de gravados "
+                    f"{field.name}s inteiros em {self.path}; grave em CSV."
+                )
+            if pa.types.is_string(esperado.type) and pa.types.is_integer(field.type):
+                texto = pc.utf8_lpad(pc.cast(table.column(i), pa.string()), INT_COLUMNS[field.name], "0")
+                table = table.set_column(i, pa.field(field.name, pa.string()), texto)
+        return table
+
+    def _write_table(self, table):
+        import pyarrow as pa
+
+        if self._schema is None:
+            self._schema = table.schema
+        elif not table.schema.equals(self._schema):
+            table = self._align_int_columns(table)
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(
+                    f"Bloco incompatível com o esquema definido pelo primeiro bloco em {self.path}; grave em CSV. {e}"
+                ) from e
+        table = self._unify_dictionaries(table)
+
+        if self._writer is None:
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                # sem compressão: mapeado em memória, o Feather é lido sem copiar (use Parquet para um arquivo menor)
+                options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                self._writer = pa.ipc.new_file(self.path, self._schema, options=options)
+        self._writer.write_table(table)
+
+    def close(self):
+        if not self._started and self.columns is not None:
+            # nenhuma linha: grava só o cabeçalho/esquema
+            vazio = pd.DataFrame({c: pd.Series(dtype=str) for c in self.columns})
+            if self.fmt is None:
+                vazio.to_csv(self.path, index=False, encoding="utf-8")
+            else:
+                self._write_table(to_typed_table(vazio))
+            self._started = True
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def write_table(df: pd.DataFrame, path: str):
+    """
+    Grava em Parquet/Feather tipado se a extensão for .parquet/.feather/.arrow, senão em CSV.
+    Aceita o esquema compacto (schema.compact): o texto original é restaurado aqui.
+    """
+    with TableWriter(path, columns=list(df.columns)) as writer:
+        writer.write(df)
+
+
+def _selected(names, usecols):
+    # colunas ausentes são ignoradas, como no read_csv_flex
+    return list(names) if usecols is None else [c for c in names if c in set(usecols)]
+
+
+def _iter_columnar(path: str, usecols: Optional[Iterable[str]], chunksize: Optional[int]):
+    """
+    Lê a tabela em lotes Arrow, só com as colunas pedidas.
+    O Parquet é lido lote a lote; o Feather é gravado sem compressão e mapeado em memória, então
+    as colunas pedidas apontam direto para o arquivo (nada é copiado nem descomprimido) e as demais
+    nem chegam a ser lidas. Sem chunksize, devolve um único lote com a tabela inteira.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if columnar_format(path) == "parquet":
+        if chunksize is None:
+            table = pq.read_table(path, columns=_selected(pq.read_schema(path).names, usecols))
+            yield table
+            return
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=_selected(pf.schema_arrow.names, usecols)):
+            yield pa.Table.from_batches([batch])
+        return
+
+    reader = pa.ipc.open_file(pa.memory_map(str(path)))
+    colunas = _selected(reader.schema.names, usecols)
+    if chunksize is None:
+        yield reader.read_all().select(colunas)
+        return
+    for i in range(reader.num_record_batches):
+        table = pa.Table.from_batches([reader.get_batch(i)]).select(colunas)
+        for batch in table.to_batches(max_chunksize=chunksize):
+            yield pa.Table.from_batches([batch])
+
+
+def read_table(path: str, usecols: Optional[Iterable[str]] = None, chunksize: Optional[int] = None):
+    """
+    Lê CSV (read_csv_flex) ou Parquet/Feather gerado por write_table, sempre devolvendo colunas de
+    texto no mesmo formato do CSV. Com chunksize, retorna um iterador de DataFrames.
+    """
+    if columnar_format(path) is None:
+        return read_csv_flex(path, usecols=usecols, chunksize=chunksize)
+
+    tables = (restore_strings(t) for t in _iter_columnar(path, usecols, chunksize))
+    return tables if chunksize is not None else next(tables)
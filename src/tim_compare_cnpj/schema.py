@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+"""
+ESQUEMA COMPACTO DAS LICENÇAS EM MEMÓRIA
+
+Depois de validadas, as colunas só de dígitos viram uint64 e as colunas muito repetidas viram
+category. O texto original só é reconstruído na escrita (restore), então os milhões de strings
+de CNPJ/MSISDN deixam de existir entre a leitura e a gravação.
+"""
+
+# Colunas só de dígitos guardadas como uint64:
+# - com largura: todos os valores precisam ter exatamente essa quantidade de dígitos
+#   (os zeros à esquerda são restaurados na escrita)
+# - sem largura (None): valores sem zero à esquerda, para que str(int) devolva o texto original
+UINT_COLUMNS = {"CNPJ": 14, "MSISDN": None}
+CATEGORY_COLUMNS = ["RAZAO SOCIAL", "STATUS_SERVICO", "DATA_STATUS_SERVICO"]
+
+# 19 dígitos sempre cabem em uint64
+MAX_DIGITS = 19
+# Marca os hashes em cnpj_keys (CNPJs de 14 dígitos são menores que 2**47)
+HASH_FLAG = np.uint64(1 << 63)
+
+
+def parse_digits(s: pd.Series, width=None):
+    """
+    Converte texto só de dígitos para uint64, de forma vetorizada (pyarrow).
+    Retorna (np.ndarray uint64, np.ndarray bool indicando quais valores eram válidos);
+    valores inválidos ficam 0.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = pc.fill_null(pa.array(s, type=pa.string(), from_pandas=True), "")
+    valid = pc.utf8_is_digit(arr)
+    if width:
+        valid = pc.and_(valid, pc.equal(pc.utf8_length(arr), width))
+    else:
+        valid = pc.and_(valid, pc.less_equal(pc.utf8_length(arr), MAX_DIGITS))
+        valid = pc.and_(valid, pc.invert(pc.starts_with(arr, "0")))
+    valid = valid.to_numpy(zero_copy_only=False)
+
+    values = np.zeros(len(arr), dtype=np.uint64)
+    if valid.any():
+        values[valid] = pc.cast(arr.filter(pa.array(valid)), pa.uint64()).to_numpy()
+    return values, valid
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas conhecidas para o esquema compacto (no próprio DataFrame).
+    Uma coluna de dígitos em que algum valor não valide continua como texto.
+    """
+    for name, width in UINT_COLUMNS.items():
+        if name in df.columns and df[name].dtype != np.uint64:
+            values, valid = parse_digits(df[name], width)
+            if valid.all():
+                df[name] = values
+    for name in CATEGORY_COLUMNS:
+        if name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
+
+
+def to_text(s: pd.Series, name=None) -> pd.Series:
+    """
+    Reconstrói o texto original de uma coluna do esquema compacto (colunas de texto passam direto).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if s.dtype == np.uint64:
+        text = pc.cast(pa.array(s.to_numpy()), pa.string())
+        width = UINT_COLUMNS.get(name if name is not None else s.name)
+        if width:
+            text = pc.utf8_lpad(text, width, "0")
+        out = text.to_pandas().astype(str)
+        out.index = s.index
+        out.name = s.name
+        return out
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(s.cat.categories.dtype)
+    return s
+
+
+def restore(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({c: to_text(df[c], c) for c in df.columns}, index=df.index)
+
+
+def cnpj_keys(s: pd.Series) -> np.ndarray:
+    """
+    Chave uint64 de cada CNPJ (sem espaços nas pontas), igual para o mesmo CNPJ esteja a coluna
+    em uint64 ou em texto, então arquivos novo e antigo comparam mesmo com esquemas diferentes.
+    CNPJs de 14 dígitos usam o próprio valor; os demais, o hash do texto com o bit mais alto ligado.
+    """
+    if s.dtype == np.uint64:
+        return s.to_numpy()
+
+    text = s.astype(str).str.strip()
+    keys, valid = parse_digits(text, UINT_COLUMNS["CNPJ"])
+    if not valid.all():
+        keys[~valid] = pd.util.hash_pandas_object(text[~valid], index=False).to_numpy() | HASH_FLAG
+    return keys
@@ -1,29 +1,32 @@
 import pandas as pd
+from contextlib import ExitStack
 from pathlib import Path
+from pandas.tseries.api import guess_datetime_format
+from src.tim_compare_cnpj.dedupe import BYTES_PER_FINGERPRINT, dedupe_in_memory, dedupe_on_disk
+from src.tim_compare_cnpj.history import parse_history
+from src.tim_compare_cnpj.io_utils import TableWriter, estimate_rows, read_csv_flex
 
 
 # ------------------------------------------
 CSV_ATIVAS = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/ativas_dezembro.csv"
 CSV_CANCEL_SUSP = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/canceladas_dezembro.csv"
+# .parquet ou .feather grava a saída tipada (colunar), que o compare_cnpj lê sem reparsear texto
 SAIDA = "/home/victor-sims/Desktop/Compare_CSV/src/tim_compare_cnpj/data/licencas_unificadas_dezembro.csv"
+# Linha do tempo completa do HISTORICO_SERVICO das canceladas/suspensas (None = não grava)
+SAIDA_EVENTOS = None
+
+# Leitura em blocos: a memória depende do tamanho do bloco, não do tamanho dos arquivos
+UNIFY_CHUNKSIZE = 1_000_000
+# Duplicatas: fingerprints de 64 bits em memória enquanto couberem no orçamento; acima disso,
+# deduplicação em disco por buckets (a saída sai agrupada por bucket, não na ordem de entrada)
+DEDUP_MEMORY_BUDGET = 512 * 1024 * 1024
+DEDUP_BUCKETS = 64
+DEDUP_TMP_DIR = None  # None = diretório temporário do sistema
 # ------------------------------------------
 
 COLS_FINAIS = ["MSISDN", "CNPJ", "RAZAO SOCIAL", "DATA_STATUS_SERVICO", "STATUS_SERVICO"]
-
-
-def read_csv_flex(path: str) -> pd.DataFrame:
-    """
-    Lê CSV tentando autodetectar separador (, ; \t).
-    Força colunas como string para evitar problemas com MSISDN/CNPJ.
-    """
-    return pd.read_csv(
-        path,
-        sep=None,              # autodetect
-        engine="python",
-        dtype=str,
-        keep_default_na=False, # evita virar NaN em campos vazios
-        encoding="utf-8"
-    )
+COLS_ATIVAS = ["MSISDN", "CNPJ", "RAZAO SOCIAL", "PARCEIRO", "STATUS_SERVICO"]
+COLS_CANCEL_SUSP = ["NUM_TERM", "CPF/CNPJ", "RAZAO_SOCIAL", "HISTORICO_SERVICO", "STATUS_SERVICO"]
 
 
 def normalize_cnpj_series(s: pd.Series) -> pd.Series:
@@ -47,17 +50,35 @@ def normalize_cnpj_series(s: pd.Series) -> pd.Series:
     return s
 
 
-def normalize_date_series(s: pd.Series) -> pd.Series:
+def clean_date_text(s: pd.Series) -> pd.Series:
+    s = s.astype(str).str.strip()
+    return s.replace({"": None, "nan": None, "None": None})
+
+
+def guess_date_format(s: pd.Series):
+    """
+    Formato que o pd.to_datetime inferiria para a coluna (a partir do primeiro valor não vazio).
+    Retorna (formato ou None, se havia valor para inferir).
+    Lendo em blocos, o formato é inferido uma vez e repassado, para que todos os blocos sejam
+    lidos como o arquivo inteiro seria.
+    """
+    s = clean_date_text(s).dropna()
+    if s.empty:
+        return None, False
+    return guess_datetime_format(s.iloc[0], dayfirst=False), True
+
+
+def normalize_date_series(s: pd.Series, date_format=None) -> pd.Series:
     """
     Normaliza datas para YYYY-MM-DD (sem horário).
     Assume padrão month-first (M/D/YYYY), pois:
       - Exemplo do parceiro: 2/5/2019 11:18
       - Exemplo status: 12/16/2025
+    date_format: formato já inferido (guess_date_format); None = o pandas infere pela própria série.
     """
-    s = s.astype(str).str.strip()
-    s = s.replace({"": None, "nan": None, "None": None})
+    s = clean_date_text(s)
 
-    d = pd.to_datetime(s, errors="coerce", dayfirst=False)  # sem infer_datetime_format
+    d = pd.to_datetime(s, errors="coerce", dayfirst=False, format=date_format)  # sem infer_datetime_format
     d = d.dt.normalize()
     return d.dt.strftime("%Y-%m-%d")
 
@@ -72,35 +93,41 @@ def extract_activation_date_from_history(hist: pd.Series) -> pd.Series:
           '190828a|200318s|...' -> '190828a'
     - Remove o sufixo de status (letra final) e usa só YYMMDD.
     - Converte YYMMDD para YYYY-MM-DD.
-      (Assumindo anos 00-69 => 2000-2069 e 70-99 => 1970-1999, padrão do pandas %y)
+      (Assumindo anos 00-68 => 2000-2068 e 69-99 => 1969-1999, padrão do %y)
+    A leitura é feita por history.parse_history (pyarrow, sem regex); o YYMMDD precisa estar
+    no início do evento e datas inexistentes (ex.: 240230) ficam vazias.
     """
-    hist = hist.astype(str).str.strip().replace({"": None, "nan": None, "None": None})
+    resumo, _ = parse_history(hist)
+    return resumo["DATA_ATIVACAO"]
 
-    # primeiro evento
-    first_event = hist.str.split("|", n=1).str[0]
 
-    # pega apenas os 6 dígitos iniciais YYMMDD (ignora a letra final: a/s/d etc.)
-    yymmdd = first_event.str.extract(r"(\d{6})", expand=False)
+def build_history_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Linha do tempo completa do HISTORICO_SERVICO: uma linha por evento, com MSISDN e CNPJ.
+    Colunas: MSISDN, CNPJ, ORDEM, DATA_EVENTO, STATUS_EVENTO.
+    """
+    _, eventos = parse_history(df["HISTORICO_SERVICO"])
+    linhas = eventos.pop("LINHA").to_numpy()
 
-    # converte para data
-    dt = pd.to_datetime(yymmdd, format="%y%m%d", errors="coerce")
-    return dt.dt.strftime("%Y-%m-%d")
+    eventos.insert(0, "MSISDN", df["NUM_TERM"].astype(str).str.strip().to_numpy()[linhas])
+    eventos.insert(1, "CNPJ", normalize_cnpj_series(df["CPF/CNPJ"]).to_numpy()[linhas])
+    return eventos
 
 
-def build_ativas(df: pd.DataFrame) -> pd.DataFrame:
-    needed = ["MSISDN", "CNPJ", "RAZAO SOCIAL", "PARCEIRO", "STATUS_SERVICO"]
+def build_ativas(df: pd.DataFrame, date_format=None) -> pd.DataFrame:
+    needed = COLS_ATIVAS
     missing = [c for c in needed if c not in df.columns]
     if missing:
         raise ValueError(f"CSV ATIVAS está sem as colunas: {missing}")
 
     out = df[needed].copy()
     out = out.rename(columns={"PARCEIRO": "DATA_STATUS_SERVICO"})
-    out["DATA_STATUS_SERVICO"] = normalize_date_series(out["DATA_STATUS_SERVICO"])
+    out["DATA_STATUS_SERVICO"] = normalize_date_series(out["DATA_STATUS_SERVICO"], date_format)
     return out[COLS_FINAIS]
 
 
 def build_cancel_susp(df: pd.DataFrame) -> pd.DataFrame:
-    needed = ["NUM_TERM", "CPF/CNPJ", "RAZAO_SOCIAL", "HISTORICO_SERVICO", "STATUS_SERVICO"]
+    needed = COLS_CANCEL_SUSP
     missing = [c for c in needed if c not in df.columns]
     if missing:
         raise ValueError(f"CSV CANCEL/SUSP está sem as colunas: {missing}")
@@ -118,28 +145,57 @@ def build_cancel_susp(df: pd.DataFrame) -> pd.DataFrame:
     return out[COLS_FINAIS]
 
 
-def main():
-    df_ativas = read_csv_flex(CSV_ATIVAS)
-    df_cancel_susp = read_csv_flex(CSV_CANCEL_SUSP)
+def normalize_unified(df: pd.DataFrame) -> pd.DataFrame:
+    df["MSISDN"] = df["MSISDN"].astype(str).str.strip()
+
+    # NORMALIZAÇÃO IMPORTANTE DO CNPJ
+    df["CNPJ"] = normalize_cnpj_series(df["CNPJ"])
 
-    unif = pd.concat(
-        [build_ativas(df_ativas), build_cancel_susp(df_cancel_susp)],
-        ignore_index=True
-    )
+    df["RAZAO SOCIAL"] = df["RAZAO SOCIAL"].astype(str).str.strip()
+    df["STATUS_SERVICO"] = df["STATUS_SERVICO"].astype(str).str.strip()
+    return df
 
-    unif["MSISDN"] = unif["MSISDN"].astype(str).str.strip()
 
-    # NORMALIZAÇÃO IMPORTANTE DO CNPJ
-    unif["CNPJ"] = normalize_cnpj_series(unif["CNPJ"])
+def iter_unified_chunks(eventos: TableWriter = None):
+    """
+    Blocos já unificados e normalizados: primeiro as ativas, depois as canceladas/suspensas
+    (a mesma ordem do concat). Com eventos, grava a linha do tempo de cada bloco de canceladas.
+    """
+    date_format, inferido = None, False
+    for chunk in read_csv_flex(CSV_ATIVAS, usecols=COLS_ATIVAS, chunksize=UNIFY_CHUNKSIZE):
+        if not inferido and "PARCEIRO" in chunk.columns:
+            date_format, inferido = guess_date_format(chunk["PARCEIRO"])
+        yield normalize_unified(build_ativas(chunk, date_format))
+
+    for chunk in read_csv_flex(CSV_CANCEL_SUSP, usecols=COLS_CANCEL_SUSP, chunksize=UNIFY_CHUNKSIZE):
+        out = normalize_unified(build_cancel_susp(chunk))
+        if eventos is not None:
+            eventos.write(build_history_events(chunk))
+        yield out
+
 
-    unif["RAZAO SOCIAL"] = unif["RAZAO SOCIAL"].astype(str).str.strip()
-    unif["STATUS_SERVICO"] = unif["STATUS_SERVICO"].astype(str).str.strip()
+def dedupe(chunks):
+    """
+    Remove duplicatas exatas do fluxo, em memória se os fingerprints couberem no orçamento.
+    """
+    linhas = estimate_rows(CSV_ATIVAS) + estimate_rows(CSV_CANCEL_SUSP)
+    if linhas * BYTES_PER_FINGERPRINT <= DEDUP_MEMORY_BUDGET:
+        return dedupe_in_memory(chunks)
+    print(f"Deduplicação em disco: ~{linhas} linhas, {DEDUP_BUCKETS} buckets")
+    return dedupe_on_disk(chunks, COLS_FINAIS, DEDUP_BUCKETS, DEDUP_TMP_DIR)
 
-    # remove duplicatas exatas
-    unif = unif.drop_duplicates()
 
-    unif.to_csv(SAIDA, index=False, encoding="utf-8")
-    print(f"OK! Gerado: {Path(SAIDA).resolve()} | Linhas: {len(unif)}")
+def main():
+    # os dois arquivos são fechados mesmo se o streaming falhar, para o Parquet/Feather não ficar sem rodapé
+    with ExitStack() as stack:
+        eventos = stack.enter_context(TableWriter(SAIDA_EVENTOS)) if SAIDA_EVENTOS else None
+        saida = stack.enter_context(TableWriter(SAIDA, columns=COLS_FINAIS))
+        for chunk in dedupe(iter_unified_chunks(eventos)):
+            saida.write(chunk)
+
+    print(f"OK! Gerado: {Path(SAIDA).resolve()} | Linhas: {saida.rows}")
+    if eventos is not None:
+        print(f"OK! Gerado: {Path(SAIDA_EVENTOS).resolve()} | Eventos: {eventos.rows}")
 
 
 if __name__ == "__main__":